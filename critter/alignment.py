@@ -0,0 +1,153 @@
+""" Lazy sequence alignment store backed by an on-disk FASTA index """
+
+import os
+import re
+import numpy
+import tempfile
+from hashlib import sha256
+from pathlib import Path
+from pyfastx import Fasta
+from typing import Iterator, Tuple, List
+from collections.abc import Mapping
+from critter.errors import CritterError
+
+
+NUCLEOTIDES = b'ACGTN'
+IUPAC_NUCLEOTIDES = b'ACGTURYSWKMBDHVN-.?'  # ambiguity codes, gaps and unknown
+
+
+def get_alphabet_table(alphabet: bytes) -> numpy.ndarray:
+    """ Boolean lookup table over byte values, true for bytes in the alphabet """
+    table = numpy.zeros(256, dtype=bool)
+    table[numpy.frombuffer(alphabet, dtype=numpy.uint8)] = True
+    return table
+
+
+class Alignment(Mapping):
+
+    """
+    Read-only mapping of sequence names to upper-case sequences
+
+    Sequences are not loaded into memory: the store is backed by the
+    pyfastx index of the FASTA file and sequences are fetched on demand,
+    so that iterating over the alignment - e.g. when streaming the
+    alignment block into the model XML - only ever holds a single
+    sequence in memory
+
+    The index is built on first use in `.critter-cache` next to the
+    FASTA file (or in the temporary directory, if the directory of the
+    FASTA file is not writable) and keyed by file size and modification
+    time, so that an index is never reused for a modified file
+    """
+
+    def __init__(self, fasta: Path):
+
+        self.fasta = fasta
+        self._index = self._open_index()
+
+    def _open_index(self) -> Fasta:
+        stat = self.fasta.stat()
+        key = sha256(f'{self.fasta.resolve()}:{stat.st_size}:{stat.st_mtime_ns}'.encode()).hexdigest()[:16]
+        for cache_dir in (self.fasta.parent / '.critter-cache', Path(tempfile.gettempdir()) / 'critter-cache'):
+            try:
+                indexed_fasta = self._build_index(cache_dir=cache_dir, key=key)
+            except OSError:
+                continue
+            return Fasta(str(indexed_fasta), build_index=True, uppercase=True)
+        # No writable cache directory: index in memory for this process only
+        return Fasta(str(self.fasta), memory_index=True, uppercase=True)
+
+    def _build_index(self, cache_dir: Path, key: str) -> Path:
+        """
+        Link to the FASTA file with its index in the cache directory, built unless it exists
+
+        The index is built by pyfastx next to a keyed symbolic link to the FASTA file
+        (custom index file paths are not handled safely by pyfastx), stale links to
+        the file and their indices are removed
+        """
+        link = cache_dir / f'{self.fasta.name}.{key}'
+        index_file = link.with_name(f'{link.name}.fxi')
+        if link.exists() and index_file.exists():
+            return link
+
+        cache_dir.mkdir(exist_ok=True)
+        stale = re.compile(re.escape(self.fasta.name) + r'\.[0-9a-f]{16}')
+        for stale_link in cache_dir.iterdir():
+            if stale.fullmatch(stale_link.name) and stale_link.is_symlink() \
+                    and os.readlink(stale_link) == str(self.fasta.resolve()):
+                stale_link.unlink(missing_ok=True)
+                stale_link.with_name(f'{stale_link.name}.fxi').unlink(missing_ok=True)
+
+        # Concurrent builds index their own temporary link and
+        # atomically move link and index into place
+        fd, tmp_link = tempfile.mkstemp(dir=cache_dir, prefix=f'{link.name}.', suffix='.tmp')
+        os.close(fd)
+        os.unlink(tmp_link)
+        try:
+            os.symlink(self.fasta.resolve(), tmp_link)
+            Fasta(tmp_link, build_index=True, uppercase=True)
+            os.replace(f'{tmp_link}.fxi', index_file)
+            os.replace(tmp_link, link)
+        finally:
+            for tmp_file in (tmp_link, f'{tmp_link}.fxi'):
+                if os.path.lexists(tmp_file):
+                    os.unlink(tmp_file)
+        return link
+
+    def __getitem__(self, name: str) -> str:
+        try:
+            return self._index[name].seq
+        except KeyError:
+            raise KeyError(name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index.keys())
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._index
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """ Sequential read of sequences in file order (faster than key lookups) """
+        for sequence in self._index:
+            yield sequence.name, sequence.seq
+
+    def validate(self, ambiguities: bool = False):
+        """
+        Validate the sequence alphabet against a byte lookup table
+
+        Each sequence is checked in a single vectorized pass over its
+        raw bytes - all offending sequences and positions are collected
+        and reported in one error. Sequences are restricted to ACTGN or,
+        if ambiguities are allowed, to IUPAC nucleotide codes and gaps
+        """
+
+        alphabet = IUPAC_NUCLEOTIDES if ambiguities else NUCLEOTIDES
+        table = get_alphabet_table(alphabet=alphabet)
+
+        invalid: List[str] = []
+        for name, seq in self.items():
+            codes = numpy.frombuffer(seq.encode('ascii', errors='replace'), dtype=numpy.uint8)
+            positions = numpy.flatnonzero(~table[codes])
+            if positions.size > 0:
+                bases = ''.join(chr(c) for c in numpy.unique(codes[positions]))
+                shown = ', '.join(str(p + 1) for p in positions[:10])
+                more = f' and {positions.size - 10} more' if positions.size > 10 else ''
+                invalid.append(f'{name} [{bases}] at positions {shown}{more}')
+
+        if invalid:
+            raise CritterError(
+                f'Alignment contains base other than {alphabet.decode()} in sequences: ' + '; '.join(invalid)
+            )
+
+    # Index handles cannot be pickled, reopen the index
+    # when the store is sent to another process
+
+    def __getstate__(self) -> dict:
+        return {'fasta': self.fasta}
+
+    def __setstate__(self, state: dict):
+        self.fasta = state['fasta']
+        self._index = self._open_index()
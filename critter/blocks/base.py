@@ -0,0 +1,43 @@
+""" Base block with memoized XML fragments """
+
+from functools import wraps
+from typing import Callable
+from pydantic import BaseModel, PrivateAttr
+
+
+class Block(BaseModel):
+    """
+    Base class for blocks with memoized XML fragments (see: cached_xml)
+
+    Cached fragments of a block are dropped whenever an attribute of the
+    block is assigned. Nested blocks (e.g. distributions of a prior) are
+    not tracked: replace them by assignment instead of modifying them in
+    place after their parent block has rendered its XML
+    """
+    _xml_cache: dict = PrivateAttr(default_factory=dict)
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name != '_xml_cache':
+            self._xml_cache.clear()
+
+    def copy(self, **kwargs):
+        block = super().copy(**kwargs)
+        block._xml_cache = {}  # copies with updated fields must not share fragments
+        return block
+
+
+def cached_xml(method: Callable[[Block], str]) -> property:
+    """ Property of an XML fragment computed once per block, until an attribute of the block is assigned """
+
+    name = method.__name__
+
+    @wraps(method)
+    def get_xml(self: Block) -> str:
+        try:
+            return self._xml_cache[name]
+        except KeyError:
+            xml = self._xml_cache[name] = method(self)
+            return xml
+
+    return property(get_xml)
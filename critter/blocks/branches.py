@@ -3,7 +3,7 @@ from critter.blocks.distributions import Distribution
 from critter.blocks.distributions import Exponential
 from critter.blocks.distributions import LogNormal
 from critter.blocks.parameters import RealParameter
-from critter.utils import get_uuid
+from critter.utils import get_id
 
 
 class BranchRateModel(BaseModel):
@@ -62,7 +62,7 @@ class UCRLBranchRateModel(BranchRateModel):
         real_space=True,
         params=[
             RealParameter(
-                id=f"RealParameter.{get_uuid(short=False)}",
+                id=get_id('RealParameter'),
                 name="M",
                 value=1.0,
                 lower=0.,
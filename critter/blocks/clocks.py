@@ -2,13 +2,13 @@ from critter.blocks.operators import SwapOperator, ScaleOperator, IntegerRandomW
 from critter.blocks.branches import UCREBranchRateModel, UCRLBranchRateModel, StrictBranchRateModel
 from critter.blocks.priors import Prior, ClockRatePrior, UCREPrior, UCRLMeanPrior, UCRLSDPrior
 from pydantic import BaseModel, ValidationError, validator
-from critter.utils import get_uuid
+from critter.utils import get_id
 from typing import List
 
 
 class Clock(BaseModel):
     """ Base class for clock models """
-    id: str = f'Clock.{get_uuid(short=True)}'
+    id: str = get_id('Clock')
 
     prior: List[Prior]
     fixed: bool = False
@@ -1,12 +1,13 @@
 """ Distribution models """
 
 from critter.blocks.parameters import RealParameter
-from critter.utils import get_uuid
+from critter.utils import get_id
 from typing import List, Optional
-from pydantic import BaseModel, PrivateAttr
+from pydantic import PrivateAttr
+from critter.blocks.base import Block, cached_xml
 
 
-class Distribution(BaseModel):
+class Distribution(Block):
     _id: str = PrivateAttr()
     _params: List[RealParameter] = PrivateAttr(default=[])
     _attr_name: dict = PrivateAttr(
@@ -19,12 +20,12 @@ class Distribution(BaseModel):
 
     def __init__(self, **data):
         super().__init__(**data)
-        self._id: str = f'Distribution.{get_uuid(short=False)}'
+        self._id: str = get_id('Distribution')
 
     def __str__(self):
         return self.xml
 
-    @property
+    @cached_xml
     def xml(self):
         _param_block = "".join([str(param) for param in self._params])
         return f'<{self.__class__.__name__} ' \
@@ -47,7 +48,7 @@ class Uniform(Distribution):
     
     def __init__(self, **data):
         super().__init__(**data)
-        self._id: str = f"Uniform.{get_uuid(short=False)}"
+        self._id: str = get_id('Uniform')
 
 
 class Exponential(Distribution):
@@ -58,8 +59,8 @@ class Exponential(Distribution):
     def __init__(self, **data):
         super().__init__(**data)
 
-        self._id: str = f"Exponential.{get_uuid(short=False)}"
-        self._mean_id = f'RealParameter.{get_uuid(short=False)}'
+        self._id: str = get_id('Exponential')
+        self._mean_id = get_id('RealParameter')
 
         self._params: List[RealParameter] = [
             RealParameter(
@@ -83,9 +84,9 @@ class LogNormal(Distribution):
 
     def __init__(self, **data):
         super().__init__(**data)
-        self._id: str = f"LogNormal.{get_uuid(short=False)}"
-        self._mean_id = f'RealParameter.{get_uuid(short=False)}'
-        self._sd_id = f'RealParameter.{get_uuid(short=False)}'       
+        self._id: str = get_id('LogNormal')
+        self._mean_id = get_id('RealParameter')
+        self._sd_id = get_id('RealParameter')       
 
         if self.mean is not None:
             self._params.append(
@@ -116,9 +117,9 @@ class Beta(Distribution):
     
     def __init__(self, **data):
         super().__init__(**data)
-        self._id: str = f"Beta.{get_uuid(short=False)}"
-        self._alpha_id = f'RealParameter.{get_uuid(short=False)}'
-        self._beta_id = f'RealParameter.{get_uuid(short=False)}'
+        self._id: str = get_id('Beta')
+        self._alpha_id = get_id('RealParameter')
+        self._beta_id = get_id('RealParameter')
 
         self._params: List[RealParameter] = [
             RealParameter(
@@ -147,9 +148,9 @@ class Gamma(Distribution):
     def __init__(self, **data):
         super().__init__(**data)
 
-        self._id: str = f"Gamma.{get_uuid(short=False)}"
-        self._alpha_id = f'RealParameter.{get_uuid(short=False)}'
-        self._beta_id = f'RealParameter.{get_uuid(short=False)}'
+        self._id: str = get_id('Gamma')
+        self._alpha_id = get_id('RealParameter')
+        self._beta_id = get_id('RealParameter')
 
         self._params: List[RealParameter] = [
             RealParameter(
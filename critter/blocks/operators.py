@@ -1,7 +1,7 @@
-from pydantic import BaseModel
+from critter.blocks.base import Block, cached_xml
 
 
-class Operator(BaseModel):
+class Operator(Block):
     """ <operator/> """
     id: str
     spec: str
@@ -9,7 +9,7 @@ class Operator(BaseModel):
     def __str__(self) -> str:
         return self.xml
 
-    @property
+    @cached_xml
     def xml(self) -> str:
         return f'<operator ' \
                f'id="{self.id}" ' \
@@ -24,7 +24,7 @@ class ScaleOperator(Operator):
     weight: float = 1.0
     scale_factor: float = 0.5
 
-    @property
+    @cached_xml
     def xml(self):
         return f'<operator ' \
                f'id="{self.id}" ' \
@@ -42,7 +42,7 @@ class IntegerRandomWalkOperator(Operator):
     weight: float = 10.0
     window_size: int = 1
 
-    @property
+    @cached_xml
     def xml(self):
         return f'<operator ' \
                f'id="{self.id}" ' \
@@ -59,7 +59,7 @@ class SwapOperator(Operator):
     parameter: str
     weight: float = 10.0
 
-    @property
+    @cached_xml
     def xml(self):
         return f'<operator ' \
                f'id="{self.id}" ' \
@@ -75,7 +75,7 @@ class UniformOperator(Operator):
     parameter: str
     weight: float = 10.0
 
-    @property
+    @cached_xml
     def xml(self):
         return f'<operator ' \
                f'id="{self.id}" ' \
@@ -93,7 +93,7 @@ class UpDownOperator(Operator):
     weight: float = 3.0
     scale_factor: float = 0.75
 
-    @property
+    @cached_xml
     def xml(self):
         return f'<operator ' \
                f'id="{self.id}" ' \
@@ -112,7 +112,7 @@ class FrequenciesExchanger(Operator):
     weight: float = 0.1
     delta: float = 0.01
 
-    @property
+    @cached_xml
     def xml(self):
         return f'<operator ' \
                f'id="{self.id}" ' \
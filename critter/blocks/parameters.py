@@ -1,9 +1,10 @@
 from math import inf as infinity
-from pydantic import BaseModel, validator
+from pydantic import validator
+from critter.blocks.base import Block, cached_xml
 from pydantic.errors import PydanticValueError
 
 
-class Parameter(BaseModel):
+class Parameter(Block):
     """ <parameter/> """
     id: str 
     name: str
@@ -17,7 +18,7 @@ class Parameter(BaseModel):
     def __str__(self) -> str:
         return self.xml
 
-    @property
+    @cached_xml
     def xml(self) -> str:
         
         if self.lower == -infinity:
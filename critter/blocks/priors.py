@@ -1,5 +1,6 @@
 
-from pydantic import BaseModel, ValidationError, root_validator, validator
+from pydantic import ValidationError, root_validator, validator
+from critter.blocks.base import Block, cached_xml
 from critter.blocks.distributions import Distribution
 from critter.blocks.parameters import RealParameter
 from critter.errors import CritterError
@@ -7,7 +8,7 @@ from math import inf as infinity
 from typing import List
 
 
-class Prior(BaseModel):
+class Prior(Block):
     """ Base class for priors """
     id: str = f'Prior'
 
@@ -24,7 +25,7 @@ class Prior(BaseModel):
     def __str__(self):
         return self.xml
 
-    @property
+    @cached_xml
     def xml(self) -> str:
         if not self.sliced:
             # Normal singular prior distribution
@@ -50,7 +51,7 @@ class Prior(BaseModel):
     def xml_prior(self) -> str:
         return self.xml
 
-    @property
+    @cached_xml
     def xml_param(self) -> str:
         # Allow for higher dimensions using slices
         initial = " ".join(str(i) for i in self.initial)
@@ -66,7 +67,7 @@ class Prior(BaseModel):
         )
         return param.xml
 
-    @property
+    @cached_xml
     def xml_logger(self) -> str:
         return f'<log idref="{self.id}"/>'
 
@@ -76,7 +77,7 @@ class Prior(BaseModel):
         return
 
     # Sliced priors: slice function, rate change times, and logger
-    @property
+    @cached_xml
     def xml_slice_function(self) -> str:
         if not self.sliced:
             return ''
@@ -90,7 +91,7 @@ class Prior(BaseModel):
                        f'count="1"/>\n'
             return xml
 
-    @property
+    @cached_xml
     def xml_slice_rate_change_times(self) -> str:
         if not self.sliced:
             return ''
@@ -116,7 +117,7 @@ class Prior(BaseModel):
                    f'spec="beast.core.parameter.RealParameter" ' \
                    f'value="{intervals}"/>\n'
 
-    @property
+    @cached_xml
     def xml_slice_logger(self) -> str:
         if not self.sliced:
             return ''
@@ -213,7 +214,7 @@ class SamplingProportionMultiTypePrior(Prior):
     id = "samplingProportion"
 
     # Using a distribution component for prior here, not sure why:
-    @property
+    @cached_xml
     def xml(self) -> str:
         return f'<distribution ' \
                f'id="{self.id}Prior" ' \
@@ -7,10 +7,14 @@
 
 import yaml
 import json
+from copy import deepcopy
+from itertools import product
 from pathlib import Path
 from enum import Enum
-from typing import List, Optional, Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterator, List, Optional, Dict, Tuple, Union
 from critter.errors import CritterError
+from critter.utils import id_scope
 from pydantic import BaseModel, ValidationError
 from critter.critter import Critter
 from critter.models import BirthDeathSkylineSerial
@@ -121,27 +125,40 @@ class CritterConfig(BaseModel):
         """
 
     def get_model(self, critter: Critter):
-        """ Model factory from configured model schema """
-
-        clock_model = self.get_clock_model()
-        substitution_model = self.get_substitution_model()
-        model_priors = self.get_model_priors()
-
-        print(str(self))
-        print(self.__dict__)
-
-        if self.model_config.type == ModelType.bdss:
-            return BirthDeathSkylineSerial(
-                critter=critter,
-                clock=clock_model,
-                substitution=substitution_model,
-                origin=model_priors.get('origin'),
-                reproductive_number=model_priors.get('reproductive_number'),
-                sampling_proportion=model_priors.get('sampling_proportion'),
-                become_uninfectious_rate=model_priors.get('become_uninfectious_rate')
-            )
-        else:
-            raise ValueError(f'Could not infer model type from given model configuration: {self.model_config.type}')
+        """
+        Model factory from configured model schema
+
+        Blocks are created in their own identifier scope, so that the
+        same configuration always renders the same model XML
+        """
+
+        with id_scope():
+            clock_model = self.get_clock_model()
+            substitution_model = self.get_substitution_model()
+            model_priors = self.get_model_priors()
+
+            if self.model_config.type == ModelType.bdss:
+                return BirthDeathSkylineSerial(
+                    critter=critter,
+                    clock=clock_model,
+                    substitution=substitution_model,
+                    origin=model_priors.get('origin'),
+                    reproductive_number=model_priors.get('reproductive_number'),
+                    sampling_proportion=model_priors.get('sampling_proportion'),
+                    become_uninfectious_rate=model_priors.get('become_uninfectious_rate')
+                )
+            else:
+                raise ValueError(f'Could not infer model type from given model configuration: {self.model_config.type}')
+
+    def render_models(self, critter: Critter, xml_files: List[Path], workers: int = 1):
+        """
+        Render a configured model to multiple files (e.g. for independent runs)
+
+        All models share the parsed alignment and dates of the Critter
+        instance, models are rendered concurrently by a pool of worker
+        processes if more than one worker is requested
+        """
+        render_configs(configs=[self]*len(xml_files), critter=critter, xml_files=xml_files, workers=workers)
 
     def get_substitution_model(self) -> SubstitutionModel:
         
@@ -300,6 +317,102 @@ class CritterConfig(BaseModel):
         return distr_models
 
 
+def render_model(config: CritterConfig, critter: Critter, xml_file: Path):
+    """ Render a configured model to file - module level for worker processes """
+    config.get_model(critter=critter).render(xml_file=xml_file)
+
+
+def render_configs(configs: List[CritterConfig], critter: Critter, xml_files: List[Path], workers: int = 1):
+    """
+    Render configured models to files, one file per configuration
+
+    All models share the parsed alignment and dates of the Critter instance,
+    models are rendered by a pool of worker processes if more than one worker
+    is requested - tasks are sent to workers in chunks, so that the Critter
+    instance is serialized once per chunk rather than once per model
+    """
+    critter.xml_dates  # rendered once and cached before sharing with workers
+
+    if workers <= 1:
+        for config, xml_file in zip(configs, xml_files):
+            render_model(config=config, critter=critter, xml_file=xml_file)
+    else:
+        workers = min(workers, len(xml_files))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for _ in executor.map(
+                render_model,
+                configs,
+                [critter]*len(xml_files),
+                xml_files,
+                chunksize=max(1, len(xml_files) // (4*workers))
+            ):
+                pass
+
+
+# Prior sensitivity sweeps
+
+def load_grid(yaml_file: Path) -> Dict[str, list]:
+    """
+    Load a parameter grid from YAML: configuration paths to lists of values
+
+    Paths are dot-separated keys into the configuration, list items are
+    addressed by index or, for priors and distributions, by their type:
+
+        model_priors.reproductive_number.distribution.0.sd: [0.5, 1.0]
+        model_priors.reproductive_number.intervals: [[0, 0.5], [0, 0.25]]
+    """
+    with yaml_file.open() as yml:
+        grid = yaml.safe_load(yml)
+
+    if not isinstance(grid, dict) or not grid:
+        raise CritterError(f'Parameter grid must map configuration paths to lists of values: {yaml_file}')
+    for path, values in grid.items():
+        if not isinstance(values, list) or not values:
+            raise CritterError(f'Parameter grid values must be a non-empty list for path: {path}')
+
+    return grid
+
+
+def get_sweep_configs(config: CritterConfig, grid: Dict[str, list]) -> Iterator[Tuple[Dict[str, Any], CritterConfig]]:
+    """ Grid values and validated configurations of all combinations of values in the parameter grid """
+
+    base = config.dict()
+    paths = list(grid)
+    for values in product(*(grid[path] for path in paths)):
+        variant = deepcopy(base)
+        for path, value in zip(paths, values):
+            set_config_value(config=variant, path=path, value=value)
+        try:
+            yield dict(zip(paths, values)), CritterConfig.parse_obj(variant)
+        except ValidationError as error:
+            raise CritterError(f'Invalid configuration for grid values {dict(zip(paths, values))}: {error}')
+
+
+def set_config_value(config: dict, path: str, value: Any):
+    """ Set a value in a configuration dictionary by dot-separated path (see: load_grid) """
+
+    def get_item(node: Union[dict, list], key: str) -> Tuple[Union[dict, list], Union[str, int]]:
+        if isinstance(node, list):
+            if key.isdigit() and int(key) < len(node):
+                return node, int(key)
+            matches = [i for i, item in enumerate(node) if isinstance(item, dict) and item.get('type') == key]
+            if len(matches) != 1:
+                raise CritterError(f'Could not find a single configuration item of type "{key}" in path: {path}')
+            return node, matches[0]
+        elif isinstance(node, dict) and key in node:
+            return node, key
+        raise CritterError(f'Could not find configuration key "{key}" in path: {path}')
+
+    node = config
+    keys = path.split('.')
+    for key in keys[:-1]:
+        parent, index = get_item(node, key)
+        node = parent[index]
+
+    parent, index = get_item(node, keys[-1])
+    parent[index] = value
+
+
 # YAML loader
 
 def load_config(yaml_file: Path) -> CritterConfig:
@@ -1,10 +1,32 @@
+import os
 import jinja2
 from pathlib import Path
-from pyfastx import Fasta
+from functools import cached_property, partial, lru_cache
+from typing import Iterator
+from critter.alignment import Alignment
 from critter.utils import get_float_dates, NULL
 from critter.errors import CritterError
 import datetime
 
+ALIGNMENT_ENTITY = 'alignment'  # external entity of referenced alignment files
+
+
+@lru_cache(maxsize=None)
+def get_template_environment() -> jinja2.Environment:
+    """
+    Template environment shared by all models of a process
+
+    Templates are compiled once per process and kept in the environment,
+    compiled template code is also cached on disk (in a user-specific
+    temporary directory), so that new processes - e.g. workers rendering
+    replicates or sweeps - load templates without compiling them again
+    """
+    return jinja2.Environment(
+        loader=jinja2.FileSystemLoader(searchpath=f"{Path(__file__).parent / 'templates'}"),
+        bytecode_cache=jinja2.FileSystemBytecodeCache()
+    )
+
+
 class Critter:
 
     def __init__(
@@ -31,32 +53,26 @@ class Critter:
         self.ambiguities = ambiguities
         self.datefmt = datefmt
 
-        self.alignment: dict = self.read_fasta(fasta=alignment_file)
+        # Pre-rendered alignment block, see: write_xml_alignment
+        self.xml_alignment_file: Path = None
+        self.xml_alignment_reference: bool = False
+
+        self.alignment: Alignment = self.read_fasta(fasta=alignment_file)
         self.dates: dict = self.read_dates(date_file=date_file)
 
         if reference_file is not None:
-            self.reference: dict = self.read_fasta(fasta=reference_file)
+            self.reference: Alignment = self.read_fasta(fasta=reference_file)
 
     @staticmethod
-    def load_template(name: str):
-        template_loader = jinja2.FileSystemLoader(
-            searchpath=f"{Path(__file__).parent / 'templates'}"
-        )
-        template_env = jinja2.Environment(loader=template_loader)
-        template = template_env.get_template(name)
-        return template
-
-    def read_fasta(self, fasta: Path) -> dict:
-        fasta = {
-            name: seq.upper() for name, seq in
-            Fasta(str(fasta), build_index=False)  # capital bases
-        }
-        for name, seq in fasta.items():
-            bases = set(seq)
-            for base in bases:
-                if base not in ('A', 'C', 'T', 'G', 'N') and not self.ambiguities:
-                    raise CritterError(f'Sequence for {name} contains base other than ACTGN: {bases}')
-        return fasta
+    def load_template(name: str) -> jinja2.Template:
+        """ Compiled template from the shared template environment, see: get_template_environment """
+        return get_template_environment().get_template(name)
+
+    def read_fasta(self, fasta: Path) -> Alignment:
+        """ Open a lazy, index-backed alignment store (capital bases) and validate sequences """
+        alignment = Alignment(fasta=fasta)
+        alignment.validate(ambiguities=self.ambiguities)
+        return alignment
 
     def read_dates(self, date_file: Path):
         
@@ -102,22 +118,68 @@ class Critter:
                 f'spec="MCMC" ' \
                 f'chainLength="{self.chain_length}">'
 
-    @property
+    @cached_property
     def xml_dates(self) -> str:
         return ",".join([
             f'{name}={date}' for name, date in self.dates.items()
         ])
 
-    @property
-    def xml_alignment(self) -> str:
-        data_block = ""
+    def xml_alignment_blocks(self) -> Iterator[str]:
+        """ Generate the sequence elements of the alignment block one at a time """
+        if self.xml_alignment_file is not None:
+            # Stream the pre-rendered block in chunks
+            with self.xml_alignment_file.open('r') as xml_in:
+                yield from iter(partial(xml_in.read, 1 << 20), '')
+            return
+
         for name, seq in self.alignment.items():
-            data_block += f'<sequence ' \
+            yield f'<sequence ' \
                 f'id="seq_{name}" ' \
                 f'spec="Sequence" ' \
                 f'taxon="{name}" ' \
                 f'value="{seq}"/>\n'
-        return data_block
+
+    def write_xml_alignment(self, xml_file: Path, reference: bool = False):
+        """
+        Render the alignment block once to file
+
+        Subsequent model renders stream the block from this file
+        instead of reading and formatting the alignment again or,
+        if the file is referenced, only refer to the file through an
+        external entity (see: xml_doctype) so that models sharing
+        an alignment are written without a copy of the alignment
+        """
+        self.xml_alignment_file = None
+        self.xml_alignment_reference = False
+        with xml_file.open('w') as xml_out:
+            for block in self.xml_alignment_blocks():
+                xml_out.write(block)
+        self.xml_alignment_file = xml_file
+        self.xml_alignment_reference = reference
+
+    def xml_data_blocks(self) -> Iterator[str]:
+        """ Content of the alignment data block: sequence elements or the reference to the alignment file """
+        if self.xml_alignment_reference:
+            yield f'&{ALIGNMENT_ENTITY};'
+        else:
+            yield from self.xml_alignment_blocks()
+
+    def xml_doctype(self, xml_file: Path = None) -> str:
+        """
+        Document type declaration of a model file with the referenced alignment file as external entity,
+        the path is relative to the model file if given - empty if the alignment block is embedded
+        """
+        if not self.xml_alignment_reference:
+            return ''
+        if xml_file is None:
+            system = self.xml_alignment_file.resolve().as_posix()
+        else:
+            system = Path(os.path.relpath(self.xml_alignment_file.resolve(), xml_file.resolve().parent)).as_posix()
+        return f'\n<!DOCTYPE beast [<!ENTITY {ALIGNMENT_ENTITY} SYSTEM "{system}">]>'
+
+    @property
+    def xml_alignment(self) -> str:
+        return "".join(self.xml_alignment_blocks())
 
     @property
     def xml_ambiguities(self) -> str:
@@ -2,91 +2,835 @@
 Functions related to posterior diagnostics (aka Tracer)
 """
 
+import os
+import re
+import json
+import numpy
 import pandas
+from io import BytesIO
+from enum import Enum
+from importlib.util import find_spec
+from hashlib import sha256
 from math import ceil
 from pathlib import Path
-from arviz.stats import hdi
+from tempfile import NamedTemporaryFile
+from typing import Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from critter.errors import CritterError
+
+
+def get_hpd_intervals(
+    values: numpy.ndarray, alpha: float = 0.95, is_sorted: bool = False
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Highest posterior density intervals along the first axis
+
+    Vectorized sorted-window search: for each column, the narrowest
+    window containing a fraction alpha of the sorted values (same
+    definition as used in Tracer and `arviz.hdi`)
+    """
+    if not is_sorted:
+        values = numpy.sort(values, axis=0)
+
+    n = values.shape[0]
+    interval_size = int(numpy.floor(alpha * n))
+    if interval_size >= n:
+        raise CritterError(f'Too few samples ({n}) to compute HPD intervals at alpha={alpha}')
+
+    widths = values[interval_size:] - values[:n - interval_size]
+    lower_index = numpy.expand_dims(numpy.argmin(widths, axis=0), axis=0)
+
+    return numpy.take_along_axis(values, lower_index, axis=0)[0], \
+        numpy.take_along_axis(values, lower_index + interval_size, axis=0)[0]
+
+
+def get_effective_sample_sizes(
+    values: numpy.ndarray, step: int = 1, max_lag: int = 2000
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Effective sample sizes and integrated autocorrelation times along the first axis
+
+    Equivalent to the Tracer estimator: autocovariances up to `max_lag` are
+    summed in pairs of consecutive lags until the first non-positive pair;
+    autocovariances are computed for all columns at once with an FFT
+
+    :param values: samples x parameters array of posterior samples
+    :param step: number of states between samples, to scale the autocorrelation time
+    :param max_lag: maximum lag of the autocovariance, as in Tracer
+    :returns: effective sample sizes and autocorrelation times (in states)
+    """
+    values = numpy.asarray(values, dtype=numpy.float64)
+    n = values.shape[0]
+    max_lag = min(n - 1, max_lag)
+    if max_lag < 1:
+        return numpy.full(values.shape[1:], numpy.nan), numpy.full(values.shape[1:], numpy.nan)
+
+    autocovariance = get_autocovariance(values, max_lag=max_lag)
+
+    even = numpy.arange(2, max_lag, 2)
+    pairs = autocovariance[even - 1] + autocovariance[even]
+    positive = numpy.cumprod(pairs > 0, axis=0, dtype=bool)  # stop at first non-positive pair
+    variance = autocovariance[0] + 2 * numpy.where(positive, pairs, 0).sum(axis=0)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        ess = n * autocovariance[0] / variance
+        act = step * variance / autocovariance[0]
+
+    return ess, act
+
+
+def get_autocovariance(values: numpy.ndarray, max_lag: int) -> numpy.ndarray:
+    """
+    Autocovariance for lags up to max_lag along the first axis
+
+    Computed by zero-padded FFT in blocks of columns to bound memory
+    on long chains, normalized by the number of pairs at each lag
+    """
+
+    n = values.shape[0]
+    size = 1 << (2 * n - 1).bit_length()
+
+    columns = values.reshape(n, -1)
+    autocovariance = numpy.empty((max_lag, columns.shape[1]))
+
+    block = max(1, (1 << 24) // size)
+    for i in range(0, columns.shape[1], block):
+        centered = columns[:, i:i+block] - columns[:, i:i+block].mean(axis=0)
+        spectrum = numpy.fft.rfft(centered, n=size, axis=0)
+        autocovariance[:, i:i+block] = numpy.fft.irfft(spectrum * spectrum.conj(), n=size, axis=0)[:max_lag]
+
+    autocovariance /= (n - numpy.arange(max_lag))[:, None]
+    return autocovariance.reshape((max_lag,) + values.shape[1:])
+
+
+class ValuesFormat(str, Enum):
+    tsv = 'tsv'
+    parquet = 'parquet'
+    feather = 'feather'
+
+
+def check_values_format(values_format: ValuesFormat):
+    """ Check that the optional dependency of a binary values format is installed, before any log is parsed """
+    if values_format != ValuesFormat.tsv and find_spec('pyarrow') is None:
+        raise CritterError(
+            f'Posterior values format {values_format.value} requires pyarrow: pip install critter[binary]'
+        )
 
 
 class PosteriorDiagnostic:
 
-    def __init__(self, log_file: Path, burnin: float = 0.1):
+    def __init__(
+        self,
+        log_file: Path,
+        burnin: float = 0.1,
+        columns: Optional[List[str]] = None,
+        prefixes: Optional[List[str]] = None,
+        cache: bool = False,
+        compact: bool = False,
+        thin: int = 1,
+        samples: Optional[int] = None,
+        ess: Optional[float] = None
+    ):
         
         self.log = log_file
         self.burnin = burnin
+        self.columns = columns  # parse only these columns
+        self.prefixes = prefixes  # parse only columns starting with these prefixes
+        self.cache = cache  # binary cache of the parsed log, see: _load_cached_log
+        self.dtype = numpy.float32 if compact else numpy.float64  # storage of posterior values
+
+        # Thinning: keep every thin-th row after burn-in, thinned further to at
+        # most the target number of samples or to the target ESS, see: _get_thinning
+        if thin < 1:
+            raise CritterError(f'Thinning factor must be a positive integer: {thin}')
+        if samples is not None and samples < 1:
+            raise CritterError(f'Target number of samples must be a positive integer: {samples}')
+        if ess is not None and ess <= 0:
+            raise CritterError(f'Target effective sample size must be positive: {ess}')
+        self.thin = thin
+        self.samples = samples
+        self.ess = ess
+
         self.data = self._parse_posterior_log()
+        if self.ess is not None:
+            self.data = self._thin_to_ess(self.data)
         self.summary = self._get_summary_statistics()
 
-        self.data['name'] = [self.log.name for _ in self.data.iterrows()]
-        self.summary['name'] = [self.log.name for _ in self.summary.iterrows()]
+        self.data['name'] = self._get_name_column(rows=len(self.data))
+        self.summary['name'] = self.log.name
+
+    def _get_name_column(self, rows: int) -> pandas.Categorical:
+        """ Log name as categorical column without a Python object per row """
+        return pandas.Categorical.from_codes(numpy.zeros(rows, dtype=numpy.int8), categories=[self.log.name])
+
+    def write_values(self, output: Path, values_format: ValuesFormat = ValuesFormat.tsv, append: bool = False):
+        """ Write the posterior values to a tab-delimited (append mode), Parquet or Feather file """
+        if values_format == ValuesFormat.tsv:
+            self.data.to_csv(output, sep='\t', index=False, header=not append, mode='a' if append else 'w')
+        elif values_format == ValuesFormat.parquet:
+            self.data.to_parquet(output, index=False)
+        elif values_format == ValuesFormat.feather:
+            self.data.reset_index(drop=True).to_feather(output)
+        else:
+            raise CritterError(f'Posterior values format not supported: {values_format}')
 
     def _parse_posterior_log(self) -> pandas.DataFrame:
-        """ Parse the posterior log avoiding using pandas.read_csv """
-        with self.log.open() as posterior_data:
-            header = []
-            data = []
-            for line in posterior_data:
-                if line.startswith("#"):
-                    continue
-                elif line.startswith("Sample"):
-                    header = line.strip().split("\t")
-                else:
-                    data.append(
-                        [float(v) for v in line.strip().split("\t")]
-                    )
-        df = pandas.DataFrame(data, columns=header)
+        """
+        Parse the posterior log into a columnar float64 (or compact float32) block
+
+        Comment lines and the header are read by hand, the last sample is
+        read from the end of the file to find the burn-in cutoff and the
+        first row after burn-in is found by bisection over the file, so that
+        burn-in rows are never parsed. Remaining rows are parsed by the pandas
+        C engine straight into a single block with only the selected
+        columns, see: _select_columns
+
+        When thinning, rows are parsed in chunks and only every thin-th row
+        of each chunk is kept, so that memory is bounded by the thinned log
+        """
+        if self.cache:
+            return self._load_cached_log()
+
+        header, data_start = self._read_header()
+        last_sample = self._read_last_sample()
+
+        return self._read_rows(
+            header=header,
+            columns=self._select_columns(header=header),
+            start=data_start,
+            sample=last_sample*self.burnin,
+            last_sample=last_sample
+        )
+
+    def _read_rows(
+        self,
+        header: List[str],
+        columns: List[str],
+        start: int,
+        sample: float,
+        last_sample: Optional[int] = None,
+        chunk_size: int = 1 << 16
+    ) -> pandas.DataFrame:
+        """
+        Parse columns of rows at or after sample, searching from the start offset
+
+        If the last sample is given, rows are thinned while parsing (see: _get_thinning),
+        with the number of rows estimated from the first two samples and the last sample
+        """
+        with self.log.open('rb') as posterior_data:
+            offset = self._find_sample(posterior_data, start=start, sample=sample)
+
+            thin = 1
+            if last_sample is not None:
+                thin = self.thin = self._get_thinning(
+                    rows=self._estimate_rows(posterior_data, offset=offset, last_sample=last_sample)
+                )
+
+            posterior_data.seek(offset)
+            reader = pandas.read_csv(
+                posterior_data,
+                sep='\t',
+                header=None,
+                names=header,
+                usecols=columns,
+                index_col=False,  # trailing tab delimiters on each line
+                dtype={column: numpy.float64 if column == 'Sample' else self.dtype for column in columns},
+                engine='c',
+                chunksize=chunk_size if thin > 1 else None
+            )
+            if thin > 1:
+                # Chunk size is not a multiple of the thinning factor, offset each chunk
+                with reader:
+                    chunks, row = [], 0
+                    for chunk in reader:
+                        chunks.append(chunk.iloc[-row % thin::thin])
+                        row += len(chunk)
+                df = pandas.concat(chunks, ignore_index=True) if chunks else pandas.DataFrame(columns=columns)
+            else:
+                df = reader
         df['Sample'] = df['Sample'].astype(int)
 
-        total_samples = df['Sample'].values[-1]
-        df = df.loc[df["Sample"] >= total_samples*self.burnin, :]
+        return df
+
+    @staticmethod
+    def _estimate_rows(posterior_data, offset: int, last_sample: int) -> int:
+        """ Number of rows from the row at offset to the last sample, assuming a constant sampling interval """
+        posterior_data.seek(offset)
+        samples = []
+        for line in iter(posterior_data.readline, b''):
+            if line.strip():
+                samples.append(int(line.split(b"\t", 1)[0]))
+            if len(samples) == 2:
+                return (last_sample - samples[0]) // max(samples[1] - samples[0], 1) + 1
+        return len(samples)
+
+    def _get_thinning(self, rows: int) -> int:
+        """ Thinning factor for a number of rows after burn-in: requested factor or coarser for the target samples """
+        thin = self.thin
+        if self.samples is not None and rows > self.samples:
+            thin = max(thin, ceil(rows / self.samples))
+        return thin
+
+    def _thin_to_ess(self, df: pandas.DataFrame) -> pandas.DataFrame:
+        """
+        Thin the parsed posterior values down to the target effective sample size
+
+        Approximately as many rows as the target ESS are kept: the ESS of
+        parameters above the target is reduced to about the target, while
+        parameters with a lower ESS are thinned at intervals shorter than
+        their autocorrelation times and keep most of their ESS
+        """
+        thin = max(1, int(len(df) // self.ess))
+        if thin == 1:
+            return df
+        self.thin *= thin
+
+        return df.iloc[::thin].reset_index(drop=True)
+
+    def _load_cached_log(self) -> pandas.DataFrame:
+        """
+        Load the posterior log from its binary cache
+
+        On first use all rows and columns are parsed and stored as a column-major
+        float64 array in `.critter-cache` next to the log, keyed by file size,
+        modification time and header. Later loads memory-map the cached array
+        and copy only the selected columns and rows after burn-in
+        """
+        header, data_start = self._read_header()
+
+        stat = self.log.stat()
+        key = sha256(f'{stat.st_size}:{stat.st_mtime_ns}:{header}'.encode()).hexdigest()[:16]
+        cache_dir = self.log.parent / '.critter-cache'
+        cache_file = cache_dir / f'{self.log.name}.{key}.npy'
+        columns_file = cache_file.with_suffix('.json')
 
-        drop_columns = [
-            column for column in df.columns 
-            if any(s in column for s in ('[', ']'))  # get rid of duplicate sliced columns
-        ]
-        df = df.drop(columns=drop_columns)
+        if cache_file.exists() and columns_file.exists():
+            cached_columns = json.loads(columns_file.read_text())
+            values = numpy.load(cache_file, mmap_mode='r')
+        else:
+            cached_columns = self._get_log_columns(header=header)
+            df = self._read_rows(header=header, columns=cached_columns, start=data_start, sample=0)
+
+            cache_dir.mkdir(exist_ok=True)
+            stale = re.compile(re.escape(self.log.name) + r'\.[0-9a-f]{16}\.(npy|json)')
+            for stale_file in cache_dir.iterdir():
+                if stale.fullmatch(stale_file.name):
+                    stale_file.unlink(missing_ok=True)
+            values = numpy.asfortranarray(df.to_numpy(dtype=numpy.float64))
+
+            # Write to temporary files and move into place, so that concurrent
+            # diagnostics of the log never load a partially written cache
+            with NamedTemporaryFile(dir=cache_dir, suffix='.tmp', delete=False) as tmp_out:
+                numpy.save(tmp_out, values)
+            os.replace(tmp_out.name, cache_file)
+            with NamedTemporaryFile('w', dir=cache_dir, suffix='.tmp', delete=False) as tmp_out:
+                json.dump(cached_columns, tmp_out)
+            os.replace(tmp_out.name, columns_file)
+
+        if len(values) == 0:
+            raise CritterError(f'Could not find any samples in log: {self.log}')
+
+        columns = self._select_columns(header=cached_columns)
+        samples = values[:, 0]
+        first = int(numpy.searchsorted(samples, samples[-1]*self.burnin, side='left'))
+        self.thin = self._get_thinning(rows=len(values) - first)
+
+        df = pandas.DataFrame(
+            values[first::self.thin, [cached_columns.index(column) for column in columns]], columns=columns
+        )
+        df = df.astype({column: int if column == 'Sample' else self.dtype for column in columns})
 
         return df
-    
+
+    def _read_header(self) -> Tuple[List[str], int]:
+        """ Get the header columns and the byte offset of the first data row """
+        with self.log.open('rb') as posterior_data:
+            for line in iter(posterior_data.readline, b''):
+                if line.startswith(b"#"):
+                    continue
+                elif line.startswith(b"Sample"):
+                    return line.decode().strip().split("\t"), posterior_data.tell()
+        raise CritterError(f'Could not find header line starting with "Sample" in log: {self.log}')
+
+    def _select_columns(self, header: List[str]) -> List[str]:
+        """ Columns to parse: sample column and requested columns or column prefixes (default all) """
+
+        if self.columns is not None:
+            missing = [column for column in self.columns if column not in header]
+            if missing:
+                raise CritterError(f'Could not find requested columns in log {self.log}: {missing}')
+
+        selected = []
+        for column in self._get_log_columns(header=header):
+            if column == 'Sample' or (self.columns is None and self.prefixes is None):
+                selected.append(column)
+            elif self.columns is not None and column in self.columns:
+                selected.append(column)
+            elif self.prefixes is not None and column.startswith(tuple(self.prefixes)):
+                selected.append(column)
+        return selected
+
+    @staticmethod
+    def _get_log_columns(header: List[str]) -> List[str]:
+        """ Get rid of duplicate sliced columns """
+        return [column for column in header if not any(s in column for s in ('[', ']'))]
+
+    def _read_last_sample(self) -> int:
+        """ Get the last sample by reading backwards from the end of the log """
+        with self.log.open('rb') as posterior_data:
+            end = posterior_data.seek(0, 2)
+            size = 4096
+            while True:
+                start = max(0, end - size)
+                posterior_data.seek(start)
+                tail = posterior_data.read(end - start)
+                lines = tail.rstrip().split(b"\n")
+                # First line in the block may be incomplete
+                if len(lines) > 1 or start == 0:
+                    last = lines[-1]
+                    break
+                size *= 2
+        try:
+            return int(last.split(b"\t", 1)[0])
+        except ValueError:
+            raise CritterError(f'Could not find any samples in log: {self.log}')
+
+    @staticmethod
+    def _find_sample(posterior_data, start: int, sample: float) -> int:
+        """ Byte offset of the first row at or after sample, by bisection over rows from start """
+
+        def next_row(offset: int) -> Tuple[int, float]:
+            # First complete row starting at or after offset
+            if offset > start:
+                posterior_data.seek(offset - 1)
+                posterior_data.readline()
+            else:
+                posterior_data.seek(start)
+            row_start = posterior_data.tell()
+            line = posterior_data.readline()
+            if not line.strip():
+                return row_start, numpy.inf
+            return row_start, float(line.split(b"\t", 1)[0])
+
+        lower, upper = start, posterior_data.seek(0, 2)
+        while lower < upper:
+            middle = (lower + upper) // 2
+            row_start, row_sample = next_row(middle)
+            if row_sample >= sample:
+                upper = middle
+            else:
+                lower = row_start + 1
+
+        return next_row(lower)[0]
+
     def _get_summary_statistics(self, alpha: float = 0.95) -> pandas.DataFrame:
         """ 
         Get summary statistics of the posteriors
 
-        Not computing ESS since the implementations in the available packages
-        differ strongly from the estimates computed in Tracer, which is the
-        standard for BEAST derived ESS computation.
+        All statistics are computed for all parameters at once on a single
+        column-sorted copy of the posterior values (see: get_hpd_intervals)
+
+        ESS and autocorrelation times use the estimator implemented in Tracer,
+        which is the standard for BEAST derived ESS computation, since the
+        implementations in the available packages differ strongly from it
+        (see: get_effective_sample_sizes)
         """
-        
-        summaries = []
-        for column in self.data.columns:
-            if column != 'Sample':
-                posterior = self.data.loc[:, column]
-                hpd_lower, hpd_upper = hdi(posterior.values, hdi_prob=alpha)
-                summaries.append((
-                    column, 
-                    posterior.mean(), 
-                    hpd_lower, 
-                    hpd_upper,
-                    posterior.std(), 
-                    posterior.median(), 
-                    posterior.min(), 
-                    posterior.max(),
-                ))
+
+        parameters = [column for column in self.data.columns if column != 'Sample']
+
+        samples = self.data['Sample'].values
+        step = int(samples[1] - samples[0]) if len(samples) > 1 else 1
+
+        posterior = self.data[parameters].to_numpy(dtype=numpy.float64, copy=True)
+        mean = posterior.mean(axis=0)
+        std = posterior.std(axis=0, ddof=1)
+        ess, act = get_effective_sample_sizes(posterior, step=step)
+
+        posterior.sort(axis=0)
+        hpd_lower, hpd_upper = get_hpd_intervals(posterior, alpha=alpha, is_sorted=True)
+
+        n = posterior.shape[0]
+        median = (posterior[(n - 1) // 2] + posterior[n // 2]) / 2
 
         return pandas.DataFrame(
-            summaries, columns=[
-                'Parameter',  'Mean',  'Lower HPD', 'Upper HPD', 'Standard Deviation', 'Median', 'Minimum', 'Maximum'
-            ]
+            {
+                'Parameter': parameters,
+                'Mean': mean,
+                'Lower HPD': hpd_lower,
+                'Upper HPD': hpd_upper,
+                'Standard Deviation': std,
+                'Median': median,
+                'Minimum': posterior[0],
+                'Maximum': posterior[-1],
+                'ESS': ess,
+                'Autocorrelation Time': act
+            }
         )
 
-    def _get_gridded_skyline(self, most_recent_sample_date: float):
+    def _get_gridded_skyline(
+        self,
+        most_recent_sample_date: float,
+        grid_points: int = 100,
+        alpha: float = 0.95,
+        parameters: Tuple[str, ...] = ('reproductiveNumber', 'samplingProportion', 'becomeUninfectiousRate'),
+        change_times: Optional[Dict[str, List[float]]] = None,
+        reverse_time_arrays: bool = True
+    ) -> pandas.DataFrame:
 
         """ 
         Gridded skyline of the reproductive number
 
-        Implements the `bdskytools` workflow conditioned on 
-        the median tree height
-        
+        Implements the `bdskytools` workflow: the skyline intervals of
+        each posterior sample are mapped onto a common grid of times
+        between the most recent sample and the median tree height.
+
+        Parameters with rate change times (`intervals` of sliced priors,
+        rendered with `reverseTimeArrays` set to true) are mapped as in
+        BDSKY: with reversed time arrays, change times are ages before
+        the most recent sample and the first interval is the most recent
+        one; otherwise change times are measured forward from the origin
+        of each sample (`origin` column) and the first interval is the
+        oldest one. Parameters without change times are conditioned on
+        the tree height of each sample: the intervals are equally sized
+        between its root (interval 1, oldest) and the most recent sample,
+        grid times older than the root take the oldest interval.
+
+        All samples and grid times are mapped at once by searching
+        the samples x grid time matrix in the interval boundaries.
+        Returns the median and HPD interval for each parameter and
+        grid time (calendar date)
         """
 
-        pass
\ No newline at end of file
+        change_times = change_times or {}
+
+        tree_height = self.data['TreeHeight'].to_numpy(dtype=numpy.float64)
+        grid = numpy.linspace(0, numpy.median(tree_height), grid_points)  # time before most recent sample
+
+        # Relative position from root (0) to most recent sample (1), samples x grid
+        position = 1 - grid[None, :] / tree_height[:, None]
+
+        skylines = []
+        for parameter in parameters:
+            columns = sorted(
+                [column for column in self.data.columns if re.match(rf'{re.escape(parameter)}\W?[0-9]+$', column)],
+                key=lambda column: int(re.findall(r'[0-9]+$', column)[0])
+            )
+            if not columns and parameter in self.data.columns:
+                columns = [parameter]  # not sliced
+            if not columns:
+                continue
+
+            values = self.data[columns].to_numpy(dtype=numpy.float64)  # samples x intervals
+            if parameter in change_times:
+                intervals = self._get_change_time_intervals(
+                    parameter=parameter,
+                    times=change_times[parameter],
+                    dimension=len(columns),
+                    grid=grid,
+                    reverse_time_arrays=reverse_time_arrays
+                )
+            else:
+                boundaries = numpy.arange(1, len(columns)) / len(columns)
+                intervals = numpy.searchsorted(boundaries, position, side='right')
+            gridded = numpy.take_along_axis(values, intervals, axis=1)  # samples x grid
+
+            gridded.sort(axis=0)
+            hpd_lower, hpd_upper = get_hpd_intervals(gridded, alpha=alpha, is_sorted=True)
+            n = gridded.shape[0]
+
+            skylines.append(
+                pandas.DataFrame({
+                    'Parameter': parameter,
+                    'Time': most_recent_sample_date - grid,
+                    'Median': (gridded[(n - 1) // 2] + gridded[n // 2]) / 2,
+                    'Lower HPD': hpd_lower,
+                    'Upper HPD': hpd_upper
+                })
+            )
+
+        if not skylines:
+            raise CritterError(f'Could not find skyline parameters {parameters} in log: {self.log}')
+
+        return pandas.concat(skylines, ignore_index=True)
+
+    def _get_change_time_intervals(
+        self, parameter: str, times: List[float], dimension: int, grid: numpy.ndarray, reverse_time_arrays: bool
+    ) -> numpy.ndarray:
+        """ Intervals of grid times (before the most recent sample) from rate change times, samples x grid """
+
+        if len(times) != dimension:
+            raise CritterError(
+                f'Number of rate change times of {parameter} ({len(times)}) does not match '
+                f'the number of intervals in log ({dimension}): {self.log}'
+            )
+
+        times = numpy.sort(numpy.asarray(times, dtype=numpy.float64))
+        if reverse_time_arrays:
+            # Ages of interval starts, most recent interval first
+            intervals = numpy.searchsorted(times, grid, side='right') - 1
+            return numpy.broadcast_to(numpy.clip(intervals, 0, dimension - 1), (len(self.data), len(grid)))
+
+        if 'origin' not in self.data.columns:
+            raise CritterError(f'Rate change times forward in time require the origin column in log: {self.log}')
+        # Forward times of interval starts from the origin, oldest interval first
+        forward = self.data['origin'].to_numpy(dtype=numpy.float64)[:, None] - grid[None, :]
+        return numpy.clip(numpy.searchsorted(times, forward, side='right') - 1, 0, dimension - 1)
+
+
+def get_posterior_diagnostics(
+    logs: List[Path], workers: int = 1, keep_data: bool = True, **kwargs
+) -> Iterator[Tuple[int, PosteriorDiagnostic]]:
+    """
+    Parse and summarize multiple posterior logs
+
+    Logs are processed concurrently by a pool of worker processes if
+    more than one worker is requested - diagnostics are yielded with
+    the position of their log in the input logs as soon as each log
+    is done, not in the order of the input logs
+
+    :param keep_data: keep the posterior values, otherwise only the summary is returned from workers
+    :param kwargs: passed to PosteriorDiagnostic
+    """
+    if workers <= 1:
+        for i, log in enumerate(logs):
+            yield i, get_posterior_diagnostic(log, keep_data=keep_data, **kwargs)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(logs))) as executor:
+            futures = {
+                executor.submit(get_posterior_diagnostic, log, keep_data=keep_data, **kwargs): i
+                for i, log in enumerate(logs)
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+
+def get_posterior_diagnostic(log: Path, keep_data: bool = True, **kwargs) -> PosteriorDiagnostic:
+    """ Posterior diagnostic of a log, optionally without posterior values - module level for worker processes """
+    diagnostic = PosteriorDiagnostic(log, **kwargs)
+    if not keep_data:
+        diagnostic.data = diagnostic.data.iloc[:0]
+    return diagnostic
+
+
+class PosteriorMonitor(PosteriorDiagnostic):
+
+    """
+    Incremental posterior diagnostics for running chains
+
+    Keeps the byte offset of the last complete row read from the log and
+    running sufficient statistics, so that each refresh only parses the
+    rows appended to the log since the previous refresh:
+
+        - count, mean, variance, minimum and maximum per block of rows,
+          merged over the blocks after burn-in - the cutoff moves as the
+          chain grows, so the rows of the block that contains the cutoff
+          are read again from the log and split at the cutoff
+
+        - a systematically thinned sketch of the chain of bounded size,
+          from which medians, HPD intervals and ESS are estimated (ESS
+          on the sketch is a lower bound when the thinning interval
+          exceeds the autocorrelation time of a parameter)
+    """
+
+    def __init__(
+        self,
+        log_file: Path,
+        burnin: float = 0.1,
+        columns: Optional[List[str]] = None,
+        prefixes: Optional[List[str]] = None,
+        block_size: int = 10000,
+        sketch_size: int = 10000
+    ):
+
+        self.log = log_file
+        self.burnin = burnin
+        self.columns = columns
+        self.prefixes = prefixes
+        self.dtype = numpy.float64
+        self.block_size = block_size
+        self.sketch_size = sketch_size
+
+        self.header: Optional[List[str]] = None
+        self.parameters: List[str] = []
+        self.offset: int = 0  # byte offset after the last complete row read
+
+        self.rows: int = 0
+        self.step: int = 1  # states between logged samples
+        self.last_sample: int = 0
+
+        # Block statistics: last sample, count, mean, sum of squared deviations, minimum, maximum
+        # and the byte offset of the first row of the block in the log
+        self.blocks: List[Tuple[int, int, numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray, int]] = []
+
+        # Thinned sketch: samples and values of every thin-th row
+        self.thin: int = 1
+        self.sketch_samples = numpy.empty(0, dtype=int)
+        self.sketch = numpy.empty((0, 0))
+
+        self.data = pandas.DataFrame()
+        self.summary = pandas.DataFrame()
+
+    def refresh(self, chunk_size: int = 1 << 26) -> int:
+        """ Consume rows appended to the log since the last refresh, returns number of new rows """
+
+        if self.header is None:
+            try:
+                self.header, self.offset = self._read_header()
+            except CritterError:
+                return 0  # header not written yet
+            columns = self._select_columns(header=self.header)
+            self.parameters = [column for column in columns if column != 'Sample']
+            self.sketch = numpy.empty((0, len(self.parameters)))
+
+        rows = self.rows
+        with self.log.open('rb') as posterior_data:
+            while True:
+                posterior_data.seek(self.offset)
+                chunk = posterior_data.read(chunk_size)
+                end = chunk.rfind(b"\n") + 1
+                if end == 0:
+                    break  # no complete rows appended
+                newlines = numpy.flatnonzero(numpy.frombuffer(chunk, dtype=numpy.uint8, count=end) == ord("\n"))
+                offsets = self.offset + numpy.concatenate([[0], newlines[:-1] + 1])
+                self._update(self._read_chunk(chunk=chunk[:end]), offsets=offsets)
+                self.offset += end
+
+        if self.rows > rows:
+            self.data = self._get_sketch_data()
+            self.summary = self._get_summary_statistics()
+            self.data['name'] = self._get_name_column(rows=len(self.data))
+            self.summary['name'] = self.log.name
+
+        return self.rows - rows
+
+    def _read_chunk(self, chunk: bytes) -> pandas.DataFrame:
+        """ Parse complete rows of the log """
+        return pandas.read_csv(
+            BytesIO(chunk),
+            sep='\t',
+            header=None,
+            names=self.header,
+            usecols=['Sample'] + self.parameters,
+            index_col=False,
+            dtype={column: numpy.float64 for column in self.parameters}
+        )
+
+    def _update(self, df: pandas.DataFrame, offsets: numpy.ndarray):
+        """ Update block statistics and sketch with new rows starting at the given byte offsets """
+
+        samples = df['Sample'].to_numpy(dtype=int)
+        values = df[self.parameters].to_numpy(dtype=numpy.float64)
+
+        if self.rows == 0 and len(samples) > 1:
+            self.step = int(samples[1] - samples[0])
+        elif self.rows == 1 and len(samples) > 0:
+            self.step = int(samples[0] - self.last_sample)
+
+        # Fill the open block first, then start new blocks
+        i = 0
+        while i < len(samples):
+            if self.blocks and self.blocks[-1][1] < self.block_size:
+                block = self.blocks.pop()
+                offset = block[6]
+            else:
+                block, offset = None, int(offsets[i])
+            size = self.block_size - (block[1] if block else 0)
+            self.blocks.append(
+                self._merge_block(block, samples[i:i+size], values[i:i+size]) + (offset,)
+            )
+            i += size
+
+        # Keep every thin-th row, doubling the interval when the sketch is full
+        keep = (numpy.arange(self.rows, self.rows + len(samples)) % self.thin) == 0
+        self.sketch_samples = numpy.concatenate([self.sketch_samples, samples[keep]])
+        self.sketch = numpy.concatenate([self.sketch, values[keep]])
+        while len(self.sketch_samples) > self.sketch_size:
+            self.thin *= 2
+            self.sketch_samples, self.sketch = self.sketch_samples[::2], self.sketch[::2]
+
+        self.rows += len(samples)
+        self.last_sample = int(samples[-1])
+
+    @staticmethod
+    def _merge_block(block: Optional[tuple], samples: numpy.ndarray, values: numpy.ndarray) -> tuple:
+        """ Merge statistics of new rows into a block (Chan et al. parallel variance) """
+
+        count = len(samples)
+        mean = values.mean(axis=0)
+        m2 = ((values - mean) ** 2).sum(axis=0)
+        minimum, maximum = values.min(axis=0), values.max(axis=0)
+
+        if block is None:
+            return int(samples[-1]), count, mean, m2, minimum, maximum
+
+        _, block_count, block_mean, block_m2, block_min, block_max = block[:6]
+        total = block_count + count
+        delta = mean - block_mean
+        return (
+            int(samples[-1]),
+            total,
+            block_mean + delta * count / total,
+            block_m2 + m2 + delta ** 2 * block_count * count / total,
+            numpy.minimum(block_min, minimum),
+            numpy.maximum(block_max, maximum)
+        )
+
+    def _split_block(self, block: tuple, end: int, cutoff: float) -> tuple:
+        """ Statistics of the rows of a block after the burn-in cutoff, read again from the log up to byte offset end """
+
+        with self.log.open('rb') as posterior_data:
+            posterior_data.seek(block[6])
+            df = self._read_chunk(chunk=posterior_data.read(end - block[6]))
+
+        df = df[df['Sample'] >= cutoff]
+        if len(df) == block[1]:
+            return block
+        return self._merge_block(
+            None, df['Sample'].to_numpy(dtype=int), df[self.parameters].to_numpy(dtype=numpy.float64)
+        ) + (block[6],)
+
+    def _get_sketch_data(self) -> pandas.DataFrame:
+        """ Sketch samples after burn-in """
+        keep = self.sketch_samples >= self.last_sample * self.burnin
+        df = pandas.DataFrame(self.sketch[keep], columns=self.parameters)
+        df.insert(0, 'Sample', self.sketch_samples[keep])
+        return df
+
+    def _get_summary_statistics(self, alpha: float = 0.95) -> pandas.DataFrame:
+        """ Summary statistics from merged block statistics and the sketch after burn-in """
+
+        cutoff = self.last_sample * self.burnin
+        first = next(i for i, block in enumerate(self.blocks) if block[0] >= cutoff)
+        end = self.blocks[first + 1][6] if first + 1 < len(self.blocks) else self.offset
+        blocks = [self._split_block(block=self.blocks[first], end=end, cutoff=cutoff)] + self.blocks[first + 1:]
+
+        counts = numpy.array([block[1] for block in blocks], dtype=numpy.float64)[:, None]
+        means = numpy.stack([block[2] for block in blocks])
+        count = counts.sum()
+        mean = (counts * means).sum(axis=0) / count
+        m2 = numpy.stack([block[3] for block in blocks]).sum(axis=0) + (counts * (means - mean) ** 2).sum(axis=0)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            std = numpy.sqrt(m2 / (count - 1))
+
+        sketch = numpy.sort(self.data[self.parameters].to_numpy(), axis=0)
+        hpd_lower, hpd_upper = get_hpd_intervals(sketch, alpha=alpha, is_sorted=True)
+        n = sketch.shape[0]
+        median = (sketch[(n - 1) // 2] + sketch[n // 2]) / 2
+        ess, act = get_effective_sample_sizes(
+            self.data[self.parameters].to_numpy(), step=self.step * self.thin
+        )
+
+        return pandas.DataFrame(
+            {
+                'Parameter': self.parameters,
+                'Mean': mean,
+                'Lower HPD': hpd_lower,
+                'Upper HPD': hpd_upper,
+                'Standard Deviation': std,
+                'Median': median,
+                'Minimum': numpy.min([block[4] for block in blocks], axis=0),
+                'Maximum': numpy.max([block[5] for block in blocks], axis=0),
+                'ESS': ess,
+                'Autocorrelation Time': act
+            }
+        )
@@ -40,16 +40,42 @@ class BirthDeathSkylineSerial:
 
         self.template = critter.load_template(name='bdss.xml')
 
-    def render(self, xml_file: Path):
+    def render(self, xml_file: Path, stream: bool = True):
+        """
+        Render the model XML to file
+
+        In streaming mode (default) the template is rendered with
+        `jinja2.Template.generate` and chunks are written straight
+        to the output file as they are produced, so the document
+        is never held in memory - the alignment block is passed
+        to the template as a generator of sequence elements
+        """
+
+        context = self.get_template_context(xml_file=xml_file)
+
+        with xml_file.open('w') as xml_out:
+            if stream:
+                for chunk in self.template.generate(**context):
+                    xml_out.write(chunk)
+            else:
+                xml_out.write(self.template.render(**context))
+
+    def get_template_context(self, xml_file: Path = None) -> dict:
+        """
+        Template variables for rendering the model XML
+
+        :param xml_file: model file, for the path to a referenced alignment file
+        """
 
         xml_slice_functions, xml_slice_rate_change_times, xml_slice_loggers = \
             self.get_slice_xmls(
                 priors=(self.reproductive_number, self.become_uninfectious_rate, self.sampling_proportion)
             )
 
-        xml = self.template.render(
+        return dict(
             # Run config
-            data_xml=self.critter.xml_alignment,
+            doctype=self.critter.xml_doctype(xml_file=xml_file),
+            data_xml=self.critter.xml_data_blocks(),
             date_xml=self.critter.xml_dates,
             mcmc_xml=self.critter.xml_run,
             tree_log=self.critter.tree_log,
@@ -86,9 +112,6 @@ class BirthDeathSkylineSerial:
             slice_loggers=xml_slice_loggers
         )
 
-        with xml_file.open('w') as xml_out:
-            xml_out.write(xml)
-
     @staticmethod
     def get_slice_xmls(
         priors: Tuple[ReproductiveNumberPrior, BecomeUninfectiousRatePrior, SamplingProportionPrior]
@@ -1,11 +1,15 @@
 import re
+import numpy
 import pandas
 import seaborn as sns
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from pathlib import Path
 from matplotlib import pyplot as plt
+from matplotlib.collections import LineCollection
 from critter.diagnostic import PosteriorDiagnostic
+from critter.trees import ArrayTree, TreeLog
 from critter.utils import get_float_dates, read_dates
+from critter.errors import CritterError
 
 BDSKY_KEEP = ("becomeUninfectiousRate", "samplingProportion", "reproductiveNumber", "clockRate")
 
@@ -195,22 +199,138 @@ def plot_sample_date_distribution(date_files: List[Path], datefmt: bool = False,
 
 class TreeView:
 
+    """
+    Rectangular tree plot of the first tree in a Newick or NEXUS tree file
+
+    Node coordinates are computed iteratively over the array-backed tree
+    (see: critter.trees.ArrayTree) and all branches are drawn as a single
+    matplotlib LineCollection, so that trees with tens of thousands of
+    tips are drawn in seconds
+    """
+
     def __init__(self, tree_file: Path, data_file: Path = None):
         
         self.tree_file = tree_file
         self.data_file = data_file
 
         self.newick: str = None
+        self.tree: ArrayTree = None
+        self.data: pandas.DataFrame = None
 
     def _read_newick(self):
 
-        with self.file.open() as tree_file:
-            self.newick = tree_file.readline().strip()
+        tree_log = TreeLog(tree_file=self.tree_file, burnin=0.)
+        try:
+            state, self.newick = next(tree_log.read_trees())
+        except StopIteration:
+            raise CritterError(f'Could not find a tree in file: {self.tree_file}')
+        self.tree = tree_log.parse(self.newick, state=state)
 
     def _read_data(self):
 
         self.data = pandas.read_csv(self.data_file, sep='\t', header=0)
 
+    def _get_layout(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Node coordinates: x is the distance from the root, tips are spaced
+        evenly on y in preorder and internal nodes are placed at the mean
+        y of their children (children have higher indices than parents,
+        so children are done when iterating nodes in reverse preorder)
+        """
+        parent = self.tree.parent.tolist()
+        tips = self.tree.taxon >= 0
+
+        y = numpy.zeros(len(parent))
+        y[tips] = numpy.arange(tips.sum())
+        total = numpy.zeros(len(parent)).tolist()
+        count = [0] * len(parent)
+        y = y.tolist()
+        for i in range(len(parent) - 1, 0, -1):
+            if count[i]:
+                y[i] = total[i] / count[i]
+            total[parent[i]] += y[i]
+            count[parent[i]] += 1
+        if count[0]:
+            y[0] = total[0] / count[0]
+
+        x = self.tree.root_height - self.tree.height
+
+        return x, numpy.array(y)
+
+    def _get_clusters(self, clusters: str) -> Tuple[numpy.ndarray, List[str]]:
+        """
+        Cluster index of each node from the cluster column of the data file (first column: tip names),
+        internal nodes are in a cluster if all their children are, otherwise -1
+        """
+        if clusters not in self.data.columns:
+            raise CritterError(f'Could not find cluster column in data file {self.data_file}: {clusters}')
+
+        tip_clusters = dict(zip(self.data.iloc[:, 0].astype(str), self.data[clusters]))
+        categories = sorted({str(c) for c in tip_clusters.values() if not pandas.isna(c)})
+        codes = {category: i for i, category in enumerate(categories)}
+
+        node_clusters = [
+            codes.get(str(tip_clusters.get(name)), -1) if name is not None else None for name in self.tree.names
+        ]
+        parent = self.tree.parent.tolist()
+        for i in range(len(parent) - 1, 0, -1):
+            p = parent[i]
+            if node_clusters[p] is None:
+                node_clusters[p] = node_clusters[i]
+            elif node_clusters[p] != node_clusters[i]:
+                node_clusters[p] = -1
+
+        return numpy.array([-1 if c is None else c for c in node_clusters]), categories
+
     def draw(self, clusters: str = None, output: Path = 'tree.png', **kwargs):
+        """
+        Draw the tree, optionally with branches and tips colored by a cluster column of the data file
+
+        :param kwargs: figsize, linewidth and tip_size of the plot
+        """
+
+        if self.tree is None:
+            self._read_newick()
+        if clusters is not None and self.data is None:
+            if self.data_file is None:
+                raise CritterError('Data file is required to color the tree by clusters')
+            self._read_data()
+
+        x, y = self._get_layout()
+        nodes = numpy.arange(1, len(self.tree))
+        parent = self.tree.parent[1:]
+
+        # Horizontal branches to each node and vertical lines over the children of each internal node
+        lower, upper = y.copy(), y.copy()
+        numpy.minimum.at(lower, parent, y[nodes])
+        numpy.maximum.at(upper, parent, y[nodes])
+        internal = numpy.flatnonzero(self.tree.taxon < 0)
+
+        segments = numpy.concatenate([
+            numpy.stack([numpy.stack([x[parent], y[nodes]], axis=1), numpy.stack([x[nodes], y[nodes]], axis=1)], axis=1),
+            numpy.stack([numpy.stack([x[internal], lower[internal]], axis=1), numpy.stack([x[internal], upper[internal]], axis=1)], axis=1)
+        ])
+
+        fig, ax = plt.subplots(nrows=1, ncols=1, figsize=kwargs.get('figsize', (14, 10)))
+
+        colors = 'black'
+        if clusters is not None:
+            node_clusters, categories = self._get_clusters(clusters=clusters)
+            palette = numpy.array(sns.color_palette('husl', len(categories)) + [(0., 0., 0.)])
+            colors = palette[numpy.concatenate([node_clusters[nodes], node_clusters[internal]])]
+
+            tips = self.tree.tips
+            ax.scatter(x[tips], y[tips], c=palette[node_clusters[tips]], s=kwargs.get('tip_size', 4), zorder=2)
+            for i, category in enumerate(categories):
+                ax.scatter([], [], color=palette[i], label=category)
+            ax.legend(title=clusters, frameon=False)
+
+        ax.add_collection(LineCollection(segments, colors=colors, linewidths=kwargs.get('linewidth', 0.5)))
+        ax.autoscale_view()
+        ax.set_yticks([])
+        for spine in ('left', 'right', 'top'):
+            ax.spines[spine].set_visible(False)
 
-        pass
\ No newline at end of file
+        plt.tight_layout()
+        fig.savefig(output)
+        plt.close(fig)
@@ -1,12 +1,16 @@
+import time
 import typer
 from typing import Optional, List
 from critter.critter import Critter
-from critter.config import load_config
-from pandas import concat
+from critter.config import load_config, load_grid, get_sweep_configs, render_configs
+from pandas import concat, DataFrame
 from pathlib import Path
-from critter.diagnostic import PosteriorDiagnostic
-from critter.plots import plot_equal_re_intervals, plot_sample_date_distribution, plot_bdsky_posterior_summary
-from critter.utils import get_date_range, dates_from_fasta
+from tempfile import TemporaryDirectory
+from critter.diagnostic import PosteriorDiagnostic, PosteriorMonitor, ValuesFormat, get_posterior_diagnostics, check_values_format
+from critter.trees import TreeLog, MaximumCladeCredibility
+from critter.plots import plot_equal_re_intervals, plot_sample_date_distribution, plot_bdsky_posterior_summary, BDSKY_KEEP, TreeView
+from critter.utils import get_date_range, dates_from_fasta, merge_xml
+from critter.errors import CritterError
 
 app = typer.Typer(add_completion=False)
 
@@ -31,8 +35,10 @@ def model(
     chain_type: Optional[str] = typer.Option('default', help="MCMC (default) or coupled MCMC (mcmcmc)"),
     chain_number: Optional[int] = typer.Option(4, help="Number of chains in coupled MCMC"),
     multiple: Optional[int] = typer.Option(1, help="Create multiple copies for independent runs"),
-    ambiguities: Optional[bool] = typer.Option(False, help="Allow ambiguous nucleotide sites in alignment (any)"),
-    datefmt: Optional[bool] = typer.Option(False, help="Dates in date file are in format: DD/MM/YYYY")
+    workers: Optional[int] = typer.Option(4, help="Number of processes rendering multiple copies"),
+    ambiguities: Optional[bool] = typer.Option(False, help="Allow IUPAC ambiguity codes, gaps and unknown sites in alignment (ACGTURYSWKMBDHVN-.?)"),
+    datefmt: Optional[bool] = typer.Option(False, help="Dates in date file are in format: DD/MM/YYYY"),
+    split_data: Optional[bool] = typer.Option(False, help="Write the alignment block once to a shared file referenced by models")
 ):
     """
     Create a birth death skyline model from config file
@@ -40,46 +46,185 @@ def model(
     
     critter_config = load_config(yaml_file=config)
 
-    for i in range(multiple):
-        critter_model = critter_config.get_model(
-            critter=Critter(
-                date_file=dates,
-                alignment_file=alignment,
-                tree_log=tree_log,
-                posterior_log=posterior_log,
-                chain_length=chain_length,
-                sample_every=sample_every,
-                chain_type=chain_type,
-                chain_number=chain_number,
-                ambiguities=ambiguities,
-                datefmt=datefmt
-            )
-        )
-        if multiple > 1:
-            indexed_output = output.with_suffix(f"_{i}{output.suffix}")
-            critter_model.render(xml_file=indexed_output)
-        else:
-            critter_model.render(xml_file=output)
+    # Alignment and dates are parsed once and shared by all copies
+    critter = Critter(
+        date_file=dates,
+        alignment_file=alignment,
+        tree_log=tree_log,
+        posterior_log=posterior_log,
+        chain_length=chain_length,
+        sample_every=sample_every,
+        chain_type=chain_type,
+        chain_number=chain_number,
+        ambiguities=ambiguities,
+        datefmt=datefmt
+    )
+
+    if multiple > 1:
+        xml_files = [output.with_name(f"{output.stem}_{i}{output.suffix}") for i in range(multiple)]
+    else:
+        xml_files = [output]
+
+    if split_data:
+        # Models reference the shared alignment block (see: utils merge-xml)
+        critter.write_xml_alignment(xml_file=output.with_name(f"{output.stem}.alignment.xml"), reference=True)
+        critter_config.render_models(critter=critter, xml_files=xml_files, workers=workers)
+    elif multiple > 1:
+        with TemporaryDirectory(dir=output.parent) as tmpdir:
+            # Render the constant alignment block once for all copies
+            critter.write_xml_alignment(xml_file=Path(tmpdir) / 'alignment.xml')
+            critter_config.render_models(critter=critter, xml_files=xml_files, workers=workers)
+    else:
+        critter_config.render_models(critter=critter, xml_files=xml_files)
+
+
+@bdsky_app.command()
+def sweep(
+    config: Path = typer.Option(..., help="Base model config file"),
+    grid: Path = typer.Option(..., help="Parameter grid file (YAML), config paths to lists of values"),
+    alignment: Path = typer.Option(..., help="Alignment file"),
+    dates: Path = typer.Option(..., help="Date file, no header, tab-seperated, name [0] dates [1]"),
+    outdir: Optional[Path] = typer.Option("sweep", help="Output directory for XML models and sweep manifest"),
+    prefix: Optional[str] = typer.Option("model", help="File name prefix of XML models"),
+    tree_log: Optional[Path] = typer.Option('tree.log', help="Tree log file [sample_every intervals]"),
+    posterior_log: Optional[Path] = typer.Option('posterior.log', help="Posterior log file [sample_every intervals]"),
+    sample_every: Optional[int] = typer.Option(1000, help="Length of sample intervals for posterior and trees"),
+    chain_length: Optional[int] = typer.Option(100000000, help="Number of steps in the Markov chain"),
+    chain_type: Optional[str] = typer.Option('default', help="MCMC (default) or coupled MCMC (mcmcmc)"),
+    chain_number: Optional[int] = typer.Option(4, help="Number of chains in coupled MCMC"),
+    workers: Optional[int] = typer.Option(4, help="Number of processes rendering models"),
+    ambiguities: Optional[bool] = typer.Option(False, help="Allow IUPAC ambiguity codes, gaps and unknown sites in alignment (ACGTURYSWKMBDHVN-.?)"),
+    datefmt: Optional[bool] = typer.Option(False, help="Dates in date file are in format: DD/MM/YYYY"),
+    split_data: Optional[bool] = typer.Option(False, help="Write the alignment block once to a shared file referenced by models")
+):
+    """
+    Create birth death skyline models for all combinations of values in a parameter grid
+    """
+
+    variants = list(get_sweep_configs(config=load_config(yaml_file=config), grid=load_grid(yaml_file=grid)))
+
+    critter = Critter(
+        date_file=dates,
+        alignment_file=alignment,
+        tree_log=tree_log,
+        posterior_log=posterior_log,
+        chain_length=chain_length,
+        sample_every=sample_every,
+        chain_type=chain_type,
+        chain_number=chain_number,
+        ambiguities=ambiguities,
+        datefmt=datefmt
+    )
+
+    outdir.mkdir(parents=True, exist_ok=True)
+    xml_files = [outdir / f"{prefix}_{i}.xml" for i in range(len(variants))]
+    configs = [variant for _, variant in variants]
+    if split_data:
+        # Models reference the shared alignment block (see: utils merge-xml)
+        critter.write_xml_alignment(xml_file=outdir / f"{prefix}.alignment.xml", reference=True)
+        render_configs(configs=configs, critter=critter, xml_files=xml_files, workers=workers)
+    else:
+        with TemporaryDirectory(dir=outdir) as tmpdir:
+            # Render the constant alignment block once for all variants
+            critter.write_xml_alignment(xml_file=Path(tmpdir) / 'alignment.xml')
+            render_configs(configs=configs, critter=critter, xml_files=xml_files, workers=workers)
+
+    DataFrame(
+        [{'model': xml_file.name, **values} for xml_file, (values, _) in zip(xml_files, variants)]
+    ).to_csv(outdir / 'sweep.tsv', sep='\t', index=False)
 
 
 @bdsky_app.command()
 def summary(
     logs: List[Path],
-    values: Optional[Path] = typer.Option('posterior.tsv', help="Raw posterior values output file"),
-    output: Optional[Path] = typer.Option('summary.tsv', help="Output file for posterior summary")
+    values: Optional[Path] = typer.Option(None, help="Raw posterior values output file (tsv) or directory (parquet, feather)"),
+    values_format: Optional[ValuesFormat] = typer.Option(ValuesFormat.tsv, help="Raw posterior values format"),
+    output: Optional[Path] = typer.Option('summary.tsv', help="Output file for posterior summary"),
+    columns: Optional[List[str]] = typer.Option(None, help="Summarize only these columns (repeat option)"),
+    prefixes: Optional[List[str]] = typer.Option(None, help="Summarize only columns with these prefixes (repeat option)"),
+    follow: Optional[bool] = typer.Option(False, help="Follow logs of running chains and refresh the summary (summary only, no values, workers, cache, compact storage or thinning)"),
+    interval: Optional[int] = typer.Option(60, help="Refresh interval in seconds when following logs"),
+    workers: Optional[int] = typer.Option(4, help="Number of processes summarizing logs"),
+    cache: Optional[bool] = typer.Option(False, help="Cache parsed logs in binary format next to the logs"),
+    compact: Optional[bool] = typer.Option(False, help="Store posterior values in single precision"),
+    thin: Optional[int] = typer.Option(1, help="Keep every n-th sample after burn-in"),
+    samples: Optional[int] = typer.Option(None, help="Thin to at most this number of samples after burn-in"),
+    ess: Optional[float] = typer.Option(None, help="Thin to approximately this effective sample size")
 ):
     """
     Create a posterior summary from log files
     """
 
-    diagnostics = [PosteriorDiagnostic(log) for log in logs]
+    if follow:
+        # Monitors summarize the selected columns only, refuse options they do not support
+        unsupported = {
+            '--values': values is not None,
+            '--values-format': values_format != ValuesFormat.tsv,
+            '--workers': workers != 4,
+            '--cache': cache,
+            '--compact': compact,
+            '--thin': thin != 1,
+            '--samples': samples is not None,
+            '--ess': ess is not None
+        }
+        options = [option for option, given in unsupported.items() if given]
+        if options:
+            raise CritterError(f'Options cannot be used when following logs: {", ".join(options)}')
 
-    diagnostic_summary = concat([d.summary for d in diagnostics])
-    diagnostic_summary.to_csv(output, sep='\t', index=False)
+        # Only rows appended since the last refresh are parsed
+        monitors = [
+            PosteriorMonitor(log, columns=columns or None, prefixes=prefixes or None) for log in logs
+        ]
+        try:
+            while True:
+                for monitor in monitors:
+                    monitor.refresh()
+                summaries = [monitor.summary for monitor in monitors if not monitor.summary.empty]
+                if summaries:
+                    concat(summaries).to_csv(output, sep='\t', index=False)
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            return
 
     if values:
-        posteriors = concat([d.data for d in diagnostics])
-        posteriors.to_csv(values, sep="\t", index=False)
+        check_values_format(values_format=values_format)
+    if values and values_format != ValuesFormat.tsv:
+        values.mkdir(parents=True, exist_ok=True)
+
+    # Summaries and values are written as soon as each log is done
+    values_columns = None
+    with output.open('w') as summary_out:
+        for i, (position, diagnostic) in enumerate(
+            get_posterior_diagnostics(
+                logs,
+                workers=workers,
+                keep_data=values is not None,
+                columns=columns or None,
+                prefixes=prefixes or None,
+                cache=cache,
+                compact=compact,
+                thin=thin,
+                samples=samples,
+                ess=ess
+            )
+        ):
+            diagnostic.summary.to_csv(summary_out, sep='\t', index=False, header=i == 0)
+            summary_out.flush()
+
+            if values and values_format == ValuesFormat.tsv:
+                if values_columns is None:
+                    values_columns = diagnostic.data.columns.tolist()
+                elif diagnostic.data.columns.tolist() != values_columns:
+                    raise CritterError(
+                        f'Columns of log {diagnostic.log} differ from previous logs, cannot append posterior '
+                        f'values to {values} - use a binary values format to write one file per log'
+                    )
+                diagnostic.write_values(output=values, values_format=values_format, append=i > 0)
+            elif values:
+                diagnostic.write_values(
+                    output=values / f"{diagnostic.log.stem}.{position}.{values_format.value}",
+                    values_format=values_format
+                )
 
 
 @bdsky_app.command()
@@ -87,13 +232,28 @@ def re_intervals(
     logs: List[Path],
     last: float = typer.Option(None, help="Last sample date (float)"),
     color: str = typer.Option(None, help="Distribution color (hex)"),
-    split: bool = typer.Option(None, help="Distribution split")
+    split: bool = typer.Option(None, help="Distribution split"),
+    cache: Optional[bool] = typer.Option(False, help="Cache parsed logs in binary format next to the logs"),
+    compact: Optional[bool] = typer.Option(False, help="Store posterior values in single precision"),
+    thin: Optional[int] = typer.Option(1, help="Keep every n-th sample after burn-in"),
+    samples: Optional[int] = typer.Option(None, help="Thin to at most this number of samples after burn-in"),
+    ess: Optional[float] = typer.Option(None, help="Thin to approximately this effective sample size")
 ):
     """
     Create a plot of Re estimates (mean, 95% HPD) 
     """
 
-    diagnostics = [PosteriorDiagnostic(log) for log in logs]
+    diagnostics = [
+        PosteriorDiagnostic(
+            log,
+            prefixes=['reproductiveNumber', 'TreeHeight'],
+            cache=cache,
+            compact=compact,
+            thin=thin,
+            samples=samples,
+            ess=ess
+        ) for log in logs
+    ]
     for diagnostic in diagnostics:
         plot_equal_re_intervals(posterior_diagnostic=diagnostic, output=diagnostic.log, last_sample=last, distribution_color=color, distribution_split=split)
 
@@ -104,15 +264,21 @@ def posterior_dist(
     prior_log: Optional[Path] = typer.Option(None, help="Log of same model run with sampling from prior"),
     output: Optional[Path] = typer.Option('posterior.png', help="Output file for posterior summary"),
     size: Optional[str] = typer.Option('14,10', help="Output plot sizes"),
+    cache: Optional[bool] = typer.Option(False, help="Cache parsed logs in binary format next to the logs"),
+    compact: Optional[bool] = typer.Option(False, help="Store posterior values in single precision"),
+    thin: Optional[int] = typer.Option(1, help="Keep every n-th sample after burn-in"),
+    samples: Optional[int] = typer.Option(None, help="Thin to at most this number of samples after burn-in"),
+    ess: Optional[float] = typer.Option(None, help="Thin to approximately this effective sample size")
 ):
     """
     Create a plot of model parameter posterior density distributions
     """
-    post = PosteriorDiagnostic(posterior_log)
+    options = dict(prefixes=BDSKY_KEEP, cache=cache, compact=compact, thin=thin, samples=samples, ess=ess)
+    post = PosteriorDiagnostic(posterior_log, **options)
 
     # matching log, sampled from prior
     if prior_log is not None:
-        prior = PosteriorDiagnostic(prior_log)
+        prior = PosteriorDiagnostic(prior_log, **options)
     else:
         prior = None
 
@@ -122,6 +288,29 @@ def posterior_dist(
     )
 
 
+@bdsky_app.command()
+def mcc_tree(
+    tree_log: Path = typer.Argument(..., help="Tree log file of model run (NEXUS) or Newick file"),
+    output: Optional[Path] = typer.Option('mcc.tree', help="Output file for annotated maximum clade credibility tree"),
+    burnin: Optional[float] = typer.Option(0.1, help="Fraction of the chain discarded as burn-in"),
+    thin: Optional[int] = typer.Option(1, help="Keep every n-th tree after burn-in"),
+    workers: Optional[int] = typer.Option(4, help="Number of processes parsing trees"),
+    batch_size: Optional[int] = typer.Option(1000, help="Number of trees sent to processes at once"),
+    max_memory: Optional[int] = typer.Option(1024, help="Memory for node heights in MB, larger logs take multiple passes")
+):
+    """
+    Create a maximum clade credibility tree with median node heights
+    """
+
+    mcc = MaximumCladeCredibility(
+        tree_log=TreeLog(tree_file=tree_log, burnin=burnin, thin=thin),
+        workers=workers,
+        batch_size=batch_size,
+        max_memory=max_memory << 20
+    )
+    mcc.write(output=output)
+
+
 @utils_app.command()
 def date_range(
     dates: Path = typer.Argument(..., help="Date file, no header, tab-seperated, name [0] dates [1]"),
@@ -154,6 +343,32 @@ def date_density(
     plot_sample_date_distribution(date_files=dates, datefmt=datefmt, equal_slices=equal_slices, output=output)
 
 
+@utils_app.command()
+def merge_xml_data(
+    xml: Path = typer.Argument(..., help="Model XML referencing a shared alignment file"),
+    output: Path = typer.Option("model.merged.xml", help="Output model XML with the alignment block included")
+):
+    """
+    Output a single model XML with referenced data files included
+    """
+
+    merge_xml(xml_file=xml, output=output)
+
+
+@utils_app.command()
+def tree_view(
+    tree: Path = typer.Argument(..., help="Tree file (Newick or NEXUS), the first tree is drawn"),
+    data: Optional[Path] = typer.Option(None, help="Tip data file, tab-separated with header, tip names [0]"),
+    clusters: Optional[str] = typer.Option(None, help="Column in tip data file to color branches and tips"),
+    output: Path = typer.Option("tree.png", help="Output plot file for the tree")
+):
+    """
+    Output a plot of a tree
+    """
+
+    TreeView(tree_file=tree, data_file=data).draw(clusters=clusters, output=output)
+
+
 @utils_app.command()
 def date_from_fasta(
     fasta: Path = typer.Argument(..., help="Fasta file with dates in sequence identifier"),
@@ -0,0 +1,536 @@
+"""
+Streaming reader of BEAST tree logs (NEXUS) and Newick tree files
+"""
+
+import re
+import numpy
+from math import log
+from pathlib import Path
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from critter.diagnostic import get_hpd_intervals
+from critter.errors import CritterError
+
+
+NEWICK_TOKEN = re.compile(r"'[^']*'|[(),:;]|[^(),:;\s]+")
+# Nodes: opening parenthesis of an internal node, closing parenthesis with
+# optional label and branch length, or tip label with optional branch length
+NEWICK_NODE = re.compile(r"(\()|(\))[^(),:;]*(?::\s*([^(),:;\s]+))?|('[^']*'|[^(),:;\s]+)(?::\s*([^(),:;\s]+))?")
+NEWICK_COMMENT = re.compile(r"\[[^\]]*\]")
+TREE_LINE = re.compile(r"\s*tree\s+(\S+?)\s*=\s*(?:\[&[RU]\]\s*)?(.*)", re.IGNORECASE)
+TREE_STATE = re.compile(r"STATE_(\d+)")
+
+
+class ArrayTree:
+
+    """
+    Compact array representation of a rooted tree
+
+    Nodes are stored in preorder (parents before their children, children
+    in the order of the Newick string, root at index zero) as arrays of
+    parent indices, branch lengths and node heights above the most recent
+    tip. Tips reference their taxon by index into the taxa of the tree log,
+    which are shared by all trees of a log and not copied per tree
+    """
+
+    __slots__ = ('parent', 'branch_length', 'height', 'taxon', 'taxa', 'state')
+
+    def __init__(
+        self,
+        parent: numpy.ndarray,
+        branch_length: numpy.ndarray,
+        taxon: numpy.ndarray,
+        taxa: List[str],
+        state: Optional[int] = None
+    ):
+
+        self.parent = parent  # parent node index, -1 for the root
+        self.branch_length = branch_length  # length of the branch to the parent node
+        self.taxon = taxon  # taxon index of tips, -1 for internal nodes
+        self.taxa = taxa
+        self.state = state  # chain state the tree was logged at
+
+        self.height = self._get_heights()
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    @property
+    def tips(self) -> numpy.ndarray:
+        """ Node indices of the tips """
+        return numpy.flatnonzero(self.taxon >= 0)
+
+    @property
+    def root_height(self) -> float:
+        return float(self.height[0])
+
+    @property
+    def names(self) -> List[Optional[str]]:
+        """ Taxon names of the nodes, None for internal nodes """
+        return [self.taxa[t] if t >= 0 else None for t in self.taxon]
+
+    def _get_heights(self) -> numpy.ndarray:
+        """ Node heights from the distances to the root, which are accumulated in preorder """
+        depth = self.branch_length.tolist()
+        parent = self.parent.tolist()
+        depth[0] = 0.
+        for i in range(1, len(depth)):
+            depth[i] += depth[parent[i]]
+        depth = numpy.array(depth)
+        return depth.max() - depth
+
+    def get_children(self) -> List[List[int]]:
+        """ Child node indices of each node in Newick order """
+        children = [[] for _ in range(len(self))]
+        for i, p in enumerate(self.parent.tolist()[1:], start=1):
+            children[p].append(i)
+        return children
+
+    def get_clades(self) -> List[int]:
+        """
+        Clade of each node as a bitset of its descendant taxa
+
+        Bitsets are arbitrary precision integers with bit i set for taxon i,
+        accumulated from the tips to the root in reverse preorder, so that
+        clades are hashable and compared exactly for any number of taxa
+        """
+        parent = self.parent.tolist()
+        clades = [1 << t if t >= 0 else 0 for t in self.taxon.tolist()]
+        for i in range(len(clades) - 1, 0, -1):
+            clades[parent[i]] |= clades[i]
+        return clades
+
+    def to_newick(self, annotations: Optional[List[str]] = None) -> str:
+        """
+        Newick string of the tree with taxon names as tip labels
+
+        :param annotations: optional comment per node written after the
+            node label, e.g. '[&height=1.0]'
+        """
+        children = self.get_children()
+        taxon = self.taxon.tolist()
+        branch_length = self.branch_length.tolist()
+
+        # Children have higher indices than their parents in preorder
+        strings: List[str] = [''] * len(self)
+        for i in range(len(self) - 1, -1, -1):
+            if children[i]:
+                node = '(' + ','.join(strings[c] for c in children[i]) + ')'
+                for c in children[i]:
+                    strings[c] = ''
+            else:
+                node = self.taxa[taxon[i]]
+            if annotations is not None and annotations[i]:
+                node += annotations[i]
+            if i > 0:
+                node += f':{branch_length[i]}'
+            strings[i] = node
+
+        return strings[0] + ';'
+
+
+def parse_newick(newick: str, labels: Dict[str, int], taxa: List[str], state: Optional[int] = None) -> ArrayTree:
+    """
+    Parse a Newick string into an array tree
+
+    Comments (e.g. BEAST metadata '[&rate=1.0]') are removed before
+    tokenizing into nodes with their branch lengths, the tree is parsed
+    iteratively with a stack of open internal nodes, so that deep
+    (ladder-like) trees do not hit the recursion limit
+
+    :param labels: tip labels (or translate block keys) to taxon indices
+    :param taxa: taxon names of the log
+    """
+    parent: List[int] = []
+    branch_length: List[float] = []
+    taxon: List[int] = []
+
+    stack: List[int] = []
+    newick = NEWICK_COMMENT.sub('', newick).split(';', 1)[0]
+    for opening, closing, closing_length, label, length in NEWICK_NODE.findall(newick):
+        if opening:
+            parent.append(stack[-1] if stack else -1)
+            branch_length.append(0.)
+            taxon.append(-1)
+            stack.append(len(parent) - 1)
+        elif closing:
+            # internal node labels (e.g. support values) are not kept
+            if not stack:
+                raise CritterError(f'Could not parse Newick tree: {newick[:100]}')
+            node = stack.pop()
+            if closing_length:
+                branch_length[node] = float(closing_length)
+        else:
+            try:
+                taxon.append(labels[label.strip("'")])
+            except KeyError:
+                raise CritterError(f'Could not find tip label in taxa of tree log: {label}')
+            parent.append(stack[-1] if stack else -1)
+            branch_length.append(float(length) if length else 0.)
+
+    if stack or not parent:
+        raise CritterError(f'Could not parse Newick tree: {newick[:100]}')
+
+    return ArrayTree(
+        parent=numpy.array(parent, dtype=numpy.int32),
+        branch_length=numpy.array(branch_length, dtype=numpy.float64),
+        taxon=numpy.array(taxon, dtype=numpy.int32),
+        taxa=taxa,
+        state=state
+    )
+
+
+class TreeLog:
+
+    """
+    Streaming reader of trees from a BEAST tree log or Newick file
+
+    Trees are read one line at a time, so that memory does not depend
+    on the size of the log. Burn-in and thinning are applied to the raw
+    tree lines before any tree is parsed: in NEXUS logs with STATE_
+    tree names the burn-in cutoff is a fraction of the last state (read
+    from the end of the file, as for posterior logs), otherwise it is a
+    fraction of the number of trees (counted in a pass without parsing)
+    """
+
+    def __init__(self, tree_file: Path, burnin: float = 0.1, thin: int = 1):
+
+        if thin < 1:
+            raise CritterError(f'Thinning factor must be a positive integer: {thin}')
+
+        self.tree_file = tree_file
+        self.burnin = burnin
+        self.thin = thin
+
+        self.nexus: bool = False
+        self.translate: Dict[str, str] = {}  # translate block keys to taxon names
+        self.taxa: List[str] = []
+        self.labels: Dict[str, int] = {}  # tip labels to taxon indices
+        self.data_start: int = 0  # byte offset of the first tree
+
+        self._read_header()
+
+    def __iter__(self) -> Iterator[ArrayTree]:
+        for state, newick in self.read_trees():
+            yield self.parse(newick, state=state)
+
+    def parse(self, newick: str, state: Optional[int] = None) -> ArrayTree:
+        """ Parse a Newick string of this log """
+        return parse_newick(newick, labels=self.labels, taxa=self.taxa, state=state)
+
+    def read_trees(self) -> Iterator[Tuple[Optional[int], str]]:
+        """ Raw Newick strings and states of trees after burn-in and thinning """
+
+        last_state = self._read_last_state() if self.nexus else None
+        if last_state is not None:
+            cutoff = last_state*self.burnin
+            skip = 0
+        else:
+            cutoff = None
+            skip = int(sum(1 for _ in self._read_tree_lines())*self.burnin)
+
+        kept = 0
+        for i, (state, newick) in enumerate(self._read_tree_lines()):
+            if (cutoff is not None and state < cutoff) or i < skip:
+                continue
+            if kept % self.thin == 0:
+                yield state, newick
+            kept += 1
+
+    def _read_tree_lines(self) -> Iterator[Tuple[Optional[int], str]]:
+        """ States (None in Newick files) and Newick strings of all trees """
+        with self.tree_file.open('rb') as tree_data:
+            tree_data.seek(self.data_start)
+            for line in tree_data:
+                tree = self._parse_tree_line(line.decode())
+                if tree is not None:
+                    yield tree
+
+    def _parse_tree_line(self, line: str) -> Optional[Tuple[Optional[int], str]]:
+        """ State and Newick string of a tree line, None if the line is not a tree """
+        if not self.nexus:
+            line = line.strip()
+            return (None, line) if line.startswith('(') else None
+
+        match = TREE_LINE.match(line)
+        if match is None:
+            return None
+        name, newick = match.groups()
+        state = TREE_STATE.search(name)
+        return int(state.group(1)) if state else None, newick.strip()
+
+    def _read_header(self):
+        """ Read the translate or taxa block (NEXUS) or taxa of the first tree (Newick) and the offset of the first tree """
+        with self.tree_file.open('rb') as tree_data:
+            first = tree_data.readline()
+            self.nexus = first.strip().upper().startswith(b'#NEXUS')
+
+            if not self.nexus:
+                tree_data.seek(0)
+                for line in iter(tree_data.readline, b''):
+                    if line.strip().startswith(b'('):
+                        names = NEWICK_TOKEN.findall(NEWICK_COMMENT.sub('', line.decode()))
+                        self.taxa = [
+                            name.strip("'") for i, name in enumerate(names)
+                            if i > 0 and names[i-1] in ('(', ',') and name not in ('(', ')', ',', ':', ';')
+                        ]
+                        break
+                self.labels = {name: i for i, name in enumerate(self.taxa)}
+                return
+
+            # Translate block or, if the trees use taxon names, the taxa block
+            entries: Dict[str, List[str]] = {'translate': [], 'taxlabels': []}
+            block = None
+            while True:
+                offset = tree_data.tell()
+                line = tree_data.readline()
+                if not line:
+                    break
+                stripped = line.decode().strip()
+                keyword = stripped.split(maxsplit=1)[0].lower() if stripped else ''
+                if block is None and keyword in entries:
+                    block = keyword
+                    stripped = stripped[len(keyword):]
+                elif TREE_LINE.match(stripped):
+                    tree_data.seek(offset)
+                    break
+                if block is not None:
+                    entries[block].append(stripped.split(';')[0])
+                    if ';' in stripped:
+                        block = None
+            self.data_start = tree_data.tell()
+
+        for entry in ' '.join(entries['translate']).split(','):
+            if entry.strip():
+                try:
+                    key, name = entry.split()
+                except ValueError:
+                    raise CritterError(f'Could not parse translate block entry in tree log {self.tree_file}: {entry}')
+                self.translate[key] = name.strip("'")
+
+        if not self.translate:
+            self.translate = {name.strip("'"): name.strip("'") for name in ' '.join(entries['taxlabels']).split()}
+        if not self.translate:
+            raise CritterError(f'Could not find translate block or taxa block in tree log: {self.tree_file}')
+
+        self.taxa = list(self.translate.values())
+        self.labels = {key: i for i, key in enumerate(self.translate)}
+        self.labels.update({name: i for i, name in enumerate(self.taxa)})
+
+    def _read_last_state(self) -> Optional[int]:
+        """ State of the last tree by reading backwards from the end of the log """
+        with self.tree_file.open('rb') as tree_data:
+            end = tree_data.seek(0, 2)
+            size = 1 << 16
+            while True:
+                start = max(self.data_start, end - size)
+                tree_data.seek(start)
+                lines = tree_data.read(end - start).split(b"\n")
+                # First line in the block may be incomplete
+                for line in reversed(lines[1:] if start > self.data_start else lines):
+                    tree = self._parse_tree_line(line.decode())
+                    if tree is not None:
+                        return tree[0]
+                if start == self.data_start:
+                    return None
+                size *= 2
+
+
+class MaximumCladeCredibility:
+
+    """
+    Maximum clade credibility tree of a tree log (as in TreeAnnotator)
+
+    Three streaming passes over the tree log after burn-in and thinning:
+
+        1. count clades (bitsets of descendant taxa, see: ArrayTree.get_clades)
+        2. find the tree with the highest sum of log clade credibilities
+        3. collect node heights of the clades in the MCC tree
+
+    Node heights of the MCC tree are set to the median heights of their
+    clades and annotated with HPD intervals, ranges and posterior support.
+    Passes are computed over batches of raw tree strings, which are parsed
+    by a pool of worker processes if more than one worker is requested -
+    only a bounded number of batches is in flight at any time
+
+    Heights of the MCC clades are collected for all trees (trees x nodes
+    of the MCC tree). If the heights do not fit into the memory limit, the
+    clades are annotated in chunks with one pass over the tree log each
+    """
+
+    def __init__(
+        self,
+        tree_log: TreeLog,
+        workers: int = 1,
+        batch_size: int = 1000,
+        alpha: float = 0.95,
+        max_memory: int = 1 << 30
+    ):
+
+        self.tree_log = tree_log
+        self.workers = workers
+        self.batch_size = batch_size
+        self.alpha = alpha
+        self.max_memory = max_memory  # bytes of node heights held at once, see: _get_annotations
+
+        self.trees: int = 0
+        self.clades: Counter = self._count_clades()
+        self.score, self.tree = self._get_mcc_tree()
+        self.annotations = self._get_annotations()
+
+    def _map_batches(self, function: Callable, **shared) -> Iterator:
+        """ Apply a worker function to batches of raw trees, results in order of completion """
+        if self.workers <= 1:
+            for index, batch in self._get_batches():
+                yield function(index, batch, labels=self.tree_log.labels, taxa=self.tree_log.taxa, **shared)
+            return
+
+        shared.update(labels=self.tree_log.labels, taxa=self.tree_log.taxa)
+        with ProcessPoolExecutor(
+            max_workers=self.workers, initializer=set_worker_state, initargs=(shared,)
+        ) as executor:
+            pending = set()
+            for index, batch in self._get_batches():
+                if len(pending) >= 2*self.workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(executor.submit(run_worker, function, index, batch))
+            for future in wait(pending).done:
+                yield future.result()
+
+    def _get_batches(self) -> Iterator[Tuple[int, List[Tuple[Optional[int], str]]]]:
+        """ Batches of raw trees with the index of the first tree in the batch """
+        batch, index = [], 0
+        for tree in self.tree_log.read_trees():
+            batch.append(tree)
+            if len(batch) == self.batch_size:
+                yield index, batch
+                index += len(batch)
+                batch = []
+        if batch:
+            yield index, batch
+
+    def _count_clades(self) -> Counter:
+        clades = Counter()
+        for trees, counts in self._map_batches(count_clades):
+            self.trees += trees
+            clades.update(counts)
+        if self.trees == 0:
+            raise CritterError(f'Could not find any trees after burn-in in tree log: {self.tree_log.tree_file}')
+        return clades
+
+    def _get_mcc_tree(self) -> Tuple[float, ArrayTree]:
+        credibility = {clade: log(count / self.trees) for clade, count in self.clades.items()}
+        # Highest score, first tree in the log on ties
+        score, index, state, newick = max(
+            self._map_batches(score_trees, credibility=credibility), key=lambda best: (best[0], -best[1])
+        )
+        return score, self.tree_log.parse(newick, state=state)
+
+    def _get_annotations(self) -> List[str]:
+        """ Set median node heights of the MCC tree and get node annotations """
+
+        clades = self.tree.get_clades()
+        # Nodes annotated per pass over the tree log
+        chunk_size = max(1, self.max_memory // (self.trees * numpy.dtype(numpy.float64).itemsize))
+
+        annotations = []
+        median = numpy.empty(len(clades))
+        for start in range(0, len(clades), chunk_size):
+            columns = {clade: i for i, clade in enumerate(clades[start:start+chunk_size])}
+            # Batch results are written into place as they complete, so that only
+            # the heights of the chunk and of batches in flight are held at once
+            heights = numpy.empty((self.trees, len(columns)))
+            for index, batch in self._map_batches(get_clade_heights, columns=columns):
+                heights[index:index+len(batch)] = batch
+            for i, clade in enumerate(clades[start:start+chunk_size], start=start):
+                values = heights[:, i - start]
+                values = numpy.sort(values[~numpy.isnan(values)])
+                median[i] = numpy.median(values)
+                support = self.clades[clade] / self.trees if self.tree.taxon[i] < 0 else 1.
+                annotation = f'posterior={support},height={median[i]},height_median={median[i]}'
+                if int(self.alpha*len(values)) < len(values):
+                    lower, upper = get_hpd_intervals(values, alpha=self.alpha, is_sorted=True)
+                    annotation += f',height_{self.alpha:.0%}_HPD={{{lower},{upper}}}'
+                annotation += f',height_range={{{values[0]},{values[-1]}}}'
+                annotations.append(f'[&{annotation}]')
+            del heights
+
+        self.tree.height = median
+        self.tree.branch_length = numpy.concatenate([[0.], median[self.tree.parent[1:]] - median[1:]])
+
+        return annotations
+
+    def write(self, output: Path):
+        """ Write the annotated MCC tree to a NEXUS file """
+        taxa = '\n'.join(f'\t\t\t{taxon}' for taxon in self.tree_log.taxa)
+        with output.open('w') as tree_file:
+            tree_file.write(
+                f'#NEXUS\n\nBegin taxa;\n\tDimensions ntax={len(self.tree_log.taxa)};\n\t\tTaxlabels\n'
+                f'{taxa}\n\t\t\t;\nEnd;\nBegin trees;\n'
+                f'tree TREE1 = [&R] {self.tree.to_newick(annotations=self.annotations)}\nEnd;\n'
+            )
+
+
+# Worker functions are module level to be sent to worker processes, state shared
+# by all batches (taxa, clade credibilities) is sent once to each worker
+
+_worker_state: dict = {}
+
+
+def set_worker_state(state: dict):
+    _worker_state.update(state)
+
+
+def run_worker(function: Callable, index: int, batch: List[Tuple[Optional[int], str]]):
+    return function(index, batch, **_worker_state)
+
+
+def count_clades(
+    index: int, batch: List[Tuple[Optional[int], str]], labels: Dict[str, int], taxa: List[str]
+) -> Tuple[int, Counter]:
+    """ Number of trees and counts of clades of internal nodes in a batch of trees """
+    counts = Counter()
+    for state, newick in batch:
+        tree = parse_newick(newick, labels=labels, taxa=taxa, state=state)
+        internal = (tree.taxon < 0).tolist()
+        counts.update(clade for clade, node in zip(tree.get_clades(), internal) if node)
+    return len(batch), counts
+
+
+def score_trees(
+    index: int,
+    batch: List[Tuple[Optional[int], str]],
+    labels: Dict[str, int],
+    taxa: List[str],
+    credibility: Dict[int, float]
+) -> Tuple[float, int, Optional[int], str]:
+    """ Score, index in the log, state and Newick string of the tree with the highest clade credibility in a batch """
+    best = None
+    for i, (state, newick) in enumerate(batch):
+        tree = parse_newick(newick, labels=labels, taxa=taxa, state=state)
+        internal = (tree.taxon < 0).tolist()
+        score = sum(credibility[clade] for clade, node in zip(tree.get_clades(), internal) if node)
+        if best is None or score > best[0]:
+            best = (score, index + i, state, newick)
+    return best
+
+
+def get_clade_heights(
+    index: int,
+    batch: List[Tuple[Optional[int], str]],
+    labels: Dict[str, int],
+    taxa: List[str],
+    columns: Dict[int, int]
+) -> Tuple[int, numpy.ndarray]:
+    """ Trees x clades array of node heights of the given clades in a batch (NaN if a tree does not contain a clade) """
+    heights = numpy.full((len(batch), len(columns)), numpy.nan)
+    for i, (state, newick) in enumerate(batch):
+        tree = parse_newick(newick, labels=labels, taxa=taxa, state=state)
+        for clade, height in zip(tree.get_clades(), tree.height.tolist()):
+            column = columns.get(clade)
+            if column is not None:
+                heights[i, column] = height
+    return index, heights
@@ -1,11 +1,19 @@
+import re
 from uuid import uuid4
 from pathlib import Path
 import datetime
+from functools import partial
 from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+from critter.errors import CritterError
 
 
 NULL = ['-', 'none', 'null', 'missing', 'na', 'NA']
 
+XML_DOCTYPE = re.compile(r'<!DOCTYPE\s+[\w:.-]+\s*\[(.*?)\]\s*>')
+XML_ENTITY = re.compile(r'<!ENTITY\s+([\w:.-]+)\s+SYSTEM\s+"([^"]*)"\s*>')
+
 
 def get_uuid(short: bool = False) -> str:
     """ Wrap the ugly call to get a UUID string """
@@ -16,6 +24,44 @@ def get_uuid(short: bool = False) -> str:
         return uuid
 
 
+class IdentifierAllocator:
+
+    """ Sequential identifiers counted per namespace, e.g. LogNormal.1, LogNormal.2 """
+
+    def __init__(self, counters: Optional[Counter] = None):
+        self.counters = Counter(counters or {})
+
+    def get_id(self, namespace: str) -> str:
+        self.counters[namespace] += 1
+        return f'{namespace}.{self.counters[namespace]}'
+
+
+_allocators: List[IdentifierAllocator] = [IdentifierAllocator()]
+
+
+def get_id(namespace: str) -> str:
+    """ Next identifier in a namespace (e.g. the block class name) from the current identifier scope """
+    return _allocators[-1].get_id(namespace)
+
+
+@contextmanager
+def id_scope() -> Iterator[IdentifierAllocator]:
+    """
+    Scope of identifiers, e.g. for all blocks of a model
+
+    Counters continue from the enclosing scope on entry, so that identifiers
+    do not clash with those of blocks created outside of the scope (e.g. block
+    defaults created on import), and are restored on exit - blocks created
+    in the same way in a new scope get the same identifiers, which makes
+    rendered models reproducible
+    """
+    _allocators.append(IdentifierAllocator(_allocators[-1].counters))
+    try:
+        yield _allocators[-1]
+    finally:
+        _allocators.pop()
+
+
 def get_year_fraction(date: datetime.datetime):
     start = datetime.date(date.year, 1, 1).toordinal()
     year_length = datetime.date(date.year+1, 1, 1).toordinal() - start
@@ -97,3 +143,43 @@ def dates_from_fasta(fasta: Path, date_file: Path, id_sep: str = "|", date_idx:
 
                 seq_name = identifier.replace(">", "")
                 da_file.write(f"{seq_name}\t{date}\n")
+
+
+def merge_xml(xml_file: Path, output: Path):
+    """
+    Resolve external entities of a model XML (e.g. a referenced alignment file)
+    into a single XML file, for tools that do not resolve external entities
+
+    Entity files are streamed into the output in chunks, paths of entity
+    files are relative to the model XML (or absolute)
+    """
+    pattern, entities = None, {}
+    with xml_file.open('r') as xml_in, output.open('w') as xml_out:
+        for line in xml_in:
+            if pattern is None and '<!DOCTYPE' in line:
+                doctype = XML_DOCTYPE.search(line)
+                if doctype is None:
+                    raise CritterError(f'Could not read document type declaration on a single line in: {xml_file}')
+                entities = {name: xml_file.parent / system for name, system in XML_ENTITY.findall(doctype.group(1))}
+                if entities:
+                    pattern = re.compile('&(' + '|'.join(re.escape(name) for name in entities) + ');')
+                line = line[:doctype.start()] + line[doctype.end():]
+                if not line.strip():
+                    continue  # declaration on its own line
+
+            if pattern is None:
+                xml_out.write(line)
+                continue
+
+            end = 0
+            for reference in pattern.finditer(line):
+                xml_out.write(line[end:reference.start()])
+                entity_file = entities[reference.group(1)]
+                try:
+                    with entity_file.open('r') as entity_in:
+                        for chunk in iter(partial(entity_in.read, 1 << 20), ''):
+                            xml_out.write(chunk)
+                except FileNotFoundError:
+                    raise CritterError(f'Could not find file of external entity "{reference.group(1)}": {entity_file}')
+                end = reference.end()
+            xml_out.write(line[end:])
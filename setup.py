@@ -20,11 +20,13 @@ setup(
         "typer",
         "pyfastx",
         "jinja2",
+        "numpy",
         "pandas",
         "arviz"
     ],
     extras_require={
-      'tests': ['pytest', 'pytest-cov']
+      'tests': ['pytest', 'pytest-cov'],
+      'binary': ['pyarrow']  # posterior values in parquet or feather format
     },
     entry_points="""
     [console_scripts]
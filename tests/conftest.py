@@ -1,6 +1,8 @@
-from pytest import fixture
+import yaml
+from pytest import fixture, mark
 from pathlib import Path
 from critter.critter import Critter
+from critter.config import CritterConfig
 from critter.blocks.parameters import infinity
 from critter.blocks.distributions import Beta
 from critter.blocks.distributions import Gamma
@@ -13,6 +15,23 @@ from critter.blocks.priors import ReproductiveNumberPrior
 from critter.blocks.priors import SamplingProportionPrior
 from critter.blocks.priors import BecomeUninfectiousRatePrior
 
+
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true", default=False, help="Run timing benchmarks")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: timing benchmark, skipped unless --benchmark is given")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(mark.skip(reason="Timing benchmark, run with --benchmark"))
+
+
 @fixture
 def bdss_strict_sliced_yaml_template_ok() -> Path: 
     return Path(__file__).parent / 'data' / 'bdss_strict_sliced.yaml'
@@ -190,3 +209,20 @@ def critter_ok(critter_dates_ok, critter_alignment_ok, critter_reference_ok) ->
         alignment_file=critter_alignment_ok,
         reference_file=critter_reference_ok
     )
+
+@fixture
+def bdss_strict_sliced_config(bdss_strict_sliced_yaml_template_ok) -> CritterConfig:
+    with bdss_strict_sliced_yaml_template_ok.open() as yml:
+        config = yaml.safe_load(yml)
+    config['model_config']['substitution_model'] = 'hky'
+    return CritterConfig.parse_obj(config)
+
+
+@fixture
+def posterior_log_ok() -> Path:
+    return Path(__file__).parent / 'data' / 'test_posterior.log'
+
+
+@fixture
+def tree_log_ok() -> Path:
+    return Path(__file__).parent / 'data' / 'test_tree.log'
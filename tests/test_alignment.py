@@ -0,0 +1,108 @@
+import os
+import pickle
+
+from pytest import raises
+from critter.alignment import Alignment
+from critter.errors import CritterError
+
+
+def test_alignment_lazy_store_success(critter_alignment_ok):
+    """
+    GIVEN: Alignment instance with valid sequence file input
+    WHEN:  Alignment instance is created
+    THEN:  Alignment instance provides upper-case sequences on demand
+    """
+
+    aln = Alignment(fasta=critter_alignment_ok)
+
+    assert len(aln) == 3
+    assert list(aln) == ['seq1', 'seq2', 'seq3']
+    assert 'seq2' in aln
+    assert 'seq4' not in aln
+    assert aln['seq3'] == 'ACTG'
+    assert list(aln.items()) == [('seq1', 'ACTG'), ('seq2', 'ACTG'), ('seq3', 'ACTG')]
+    assert aln == {'seq1': 'ACTG', 'seq2': 'ACTG', 'seq3': 'ACTG'}
+
+    with raises(KeyError):
+        aln['seq4']
+
+
+def test_alignment_lazy_store_pickle_success(critter_alignment_ok):
+    """
+    GIVEN: Alignment instance with valid sequence file input
+    WHEN:  Alignment instance is pickled and unpickled (e.g. sent to worker processes)
+    THEN:  Alignment instance index is reopened and sequences are available
+    """
+
+    aln = pickle.loads(pickle.dumps(Alignment(fasta=critter_alignment_ok)))
+
+    assert aln.fasta == critter_alignment_ok
+    assert aln['seq1'] == 'ACTG'
+
+
+def test_alignment_index_modified_file_success(tmp_path):
+    """
+    GIVEN: Alignment instance with an index built for a sequence file
+    WHEN:  Sequence file is overwritten and a new Alignment instance is created
+    THEN:  Alignment instance rebuilds the index and the stale index is removed
+    """
+
+    fasta = tmp_path / 'aln.fasta'
+    fasta.write_text('>s1\nACGT\n>s2\nAAAA\n')
+    assert list(Alignment(fasta=fasta).items()) == [('s1', 'ACGT'), ('s2', 'AAAA')]
+
+    fasta.write_text('>x1\nTTTT\n>x2\nGG\n>x3\nC\n')
+    os.utime(fasta, ns=(fasta.stat().st_atime_ns, fasta.stat().st_mtime_ns + 1))
+    assert list(Alignment(fasta=fasta).items()) == [('x1', 'TTTT'), ('x2', 'GG'), ('x3', 'C')]
+    assert len(list((tmp_path / '.critter-cache').glob('aln.fasta.*'))) == 2  # link and index
+
+
+def test_alignment_index_unwritable_directory_success(tmp_path):
+    """
+    GIVEN: Alignment instance with a sequence file in a directory where the index cannot be written
+    WHEN:  Alignment instance is created
+    THEN:  Alignment instance falls back to an index outside the directory of the sequence file
+    """
+
+    fasta = tmp_path / 'aln.fasta'
+    fasta.write_text('>s1\nACGT\n')
+    (tmp_path / '.critter-cache').write_text('')  # cache directory cannot be created
+
+    assert Alignment(fasta=fasta) == {'s1': 'ACGT'}
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['.critter-cache', 'aln.fasta']
+
+
+def test_alignment_validate_success(critter_alignment_ok):
+    """
+    GIVEN: Alignment instance with valid sequence file input
+    WHEN:  Alignment sequences are validated with and without ambiguities
+    THEN:  Alignment validation passes
+    """
+
+    aln = Alignment(fasta=critter_alignment_ok)
+    aln.validate(ambiguities=False)
+    aln.validate(ambiguities=True)
+
+
+def test_alignment_validate_fail(critter_alignment_bad):
+    """
+    GIVEN: Alignment instance with invalid sequence file input
+    WHEN:  Alignment sequences are validated with and without ambiguities
+    THEN:  Alignment validation fails reporting all offending sequences and positions
+    """
+
+    aln = Alignment(fasta=critter_alignment_bad)
+
+    with raises(CritterError) as e:
+        aln.validate(ambiguities=False)
+
+    assert 'seq1 [M] at positions 5' in str(e.value)
+    assert 'seq2 [R] at positions 5' in str(e.value)
+    assert 'seq3 [Z] at positions 5' in str(e.value)
+
+    with raises(CritterError) as e:
+        aln.validate(ambiguities=True)
+
+    assert 'seq1' not in str(e.value)
+    assert 'seq2' not in str(e.value)
+    assert 'seq3 [Z] at positions 5' in str(e.value)
@@ -0,0 +1,46 @@
+import pickle
+
+from critter.blocks.operators import ScaleOperator
+from critter.blocks.distributions import Exponential
+from critter.blocks.priors import OriginPrior
+
+
+def test_block_cached_xml_success():
+    """
+    GIVEN: Operator model with valid parameters
+    WHEN:  Operator XML is accessed repeatedly
+    THEN:  Operator XML is computed once and recomputed after a field is assigned
+    """
+    op = ScaleOperator(id="test", parameter="@test")
+
+    xml = op.xml
+    assert op.xml is xml
+
+    op.weight = 2.0
+    assert op.xml is not xml
+    assert 'weight="2.0"' in op.xml
+
+    copied = op.copy(update={'weight': 3.0})
+    assert 'weight="3.0"' in copied.xml
+    assert 'weight="2.0"' in op.xml
+
+    unpickled = pickle.loads(pickle.dumps(op))
+    assert unpickled.xml == op.xml
+
+
+def test_prior_cached_xml_success():
+    """
+    GIVEN: Prior model with valid distribution
+    WHEN:  Prior XML fragments are accessed repeatedly
+    THEN:  Prior XML fragments are computed once and recomputed after a field or distribution is assigned
+    """
+    prior = OriginPrior(initial=[100.0], distribution=[Exponential(mean=10.0)])
+
+    xml, xml_param = prior.xml, prior.xml_param
+    assert prior.xml is xml
+    assert prior.xml_param is xml_param
+
+    prior.distribution = [Exponential(mean=20.0)]
+    assert prior.xml is not xml
+    assert '20.0' in prior.xml
+    assert prior.xml_param == xml_param
@@ -1,4 +1,8 @@
-from critter.config import load_config
+from pytest import raises
+from xml.etree import ElementTree
+from critter.config import load_config, load_grid, get_sweep_configs, render_configs
+from critter.errors import CritterError
+from critter.utils import merge_xml
 from critter.models import BirthDeathSkylineSerial
 
 def test_load_model_strict_sliced_yaml_success(bdss_strict_sliced_yaml_template_ok):
@@ -72,3 +76,113 @@ def test_get_model_ucrl_sliced_yaml_success(bdss_ucrl_sliced_yaml_template_ok, c
     print(critter_model.clock)
 
     assert isinstance(critter_model, BirthDeathSkylineSerial)
+
+
+def test_render_models_multiple_success(tmp_path, bdss_strict_sliced_config, critter_ok):
+    """
+    GIVEN: CritterConfig instance with valid configuration and a shared Critter instance
+    WHEN:  CritterConfig models are rendered to multiple files with a pre-rendered alignment block
+    THEN:  CritterConfig models are rendered by worker processes with the shared alignment block
+    """
+
+    critter_ok.write_xml_alignment(xml_file=tmp_path / 'alignment.xml')
+    xml_files = [tmp_path / f'model_{i}.xml' for i in range(3)]
+
+    bdss_strict_sliced_config.render_models(critter=critter_ok, xml_files=xml_files, workers=2)
+
+    for xml_file in xml_files:
+        xml = xml_file.read_text()
+        assert (tmp_path / 'alignment.xml').read_text() in xml
+        assert critter_ok.xml_dates in xml
+    assert len({xml_file.read_text() for xml_file in xml_files}) == 1
+
+
+def test_get_model_reproducible_ids_success(bdss_strict_sliced_config, critter_ok):
+    """
+    GIVEN: CritterConfig instance with valid configuration
+    WHEN:  CritterConfig models are created multiple times
+    THEN:  CritterConfig models have the same sequential block identifiers
+    """
+
+    first = bdss_strict_sliced_config.get_model(critter=critter_ok)
+    second = bdss_strict_sliced_config.get_model(critter=critter_ok)
+
+    first_ids = [distribution._id for distribution in first.reproductive_number.distribution]
+    second_ids = [distribution._id for distribution in second.reproductive_number.distribution]
+    assert first_ids == second_ids
+    assert len(set(first_ids)) == len(first_ids)
+    assert first.get_template_context()['reproductive_number_prior'] == second.get_template_context()['reproductive_number_prior']
+
+
+def test_get_sweep_configs_success(tmp_path, bdss_strict_sliced_config, critter_ok):
+    """
+    GIVEN: CritterConfig instance with valid configuration and a parameter grid
+    WHEN:  CritterConfig variants are created for all combinations of grid values and rendered
+    THEN:  CritterConfig variants have the grid values set by index and prior or distribution type
+    """
+
+    grid_file = tmp_path / 'grid.yaml'
+    grid_file.write_text(
+        'model_priors.reproductive_number.distribution.0.alpha: [1.0, 5.0]\n'
+        'model_priors.origin.initial: [[2.0], [3.0], [4.0]]\n'
+    )
+    variants = list(get_sweep_configs(config=bdss_strict_sliced_config, grid=load_grid(yaml_file=grid_file)))
+
+    assert len(variants) == 6
+    values, config = variants[-1]
+    assert values == {
+        'model_priors.reproductive_number.distribution.0.alpha': 5.0, 'model_priors.origin.initial': [4.0]
+    }
+    priors = {prior.type: prior for prior in config.model_priors}
+    assert priors['reproductive_number'].distribution[0].alpha == 5.0
+    assert priors['origin'].initial == [4.0]
+    assert bdss_strict_sliced_config != config
+
+    xml_files = [tmp_path / f'model_{i}.xml' for i in range(len(variants))]
+    render_configs(configs=[config for _, config in variants], critter=critter_ok, xml_files=xml_files)
+    assert len({xml_file.read_text() for xml_file in xml_files}) == 6
+
+
+def test_get_sweep_configs_fail(tmp_path, bdss_strict_sliced_config):
+    """
+    GIVEN: CritterConfig instance with valid configuration and invalid parameter grids
+    WHEN:  CritterConfig variants are created
+    THEN:  CritterError is raised
+    """
+
+    with raises(CritterError):
+        list(get_sweep_configs(config=bdss_strict_sliced_config, grid={'model_priors.rho.initial': [[1.0]]}))
+
+    with raises(CritterError):
+        list(get_sweep_configs(config=bdss_strict_sliced_config, grid={'model_config.unknown': [1]}))
+
+    grid_file = tmp_path / 'grid.yaml'
+    grid_file.write_text('model_priors.origin.initial: 2.0\n')
+    with raises(CritterError):
+        load_grid(yaml_file=grid_file)
+
+
+def test_render_models_referenced_alignment_success(tmp_path, bdss_strict_sliced_config, critter_ok):
+    """
+    GIVEN: CritterConfig instance with valid configuration and an alignment block written to a referenced file
+    WHEN:  CritterConfig models are rendered and merged with the referenced alignment file
+    THEN:  CritterConfig models reference the alignment file and merged models equal models with embedded alignment
+    """
+
+    (tmp_path / 'models').mkdir()
+    inline_file = tmp_path / 'inline.xml'
+    bdss_strict_sliced_config.render_models(critter=critter_ok, xml_files=[inline_file])
+
+    critter_ok.write_xml_alignment(xml_file=tmp_path / 'alignment.xml', reference=True)
+    xml_file = tmp_path / 'models' / 'model.xml'
+    bdss_strict_sliced_config.render_models(critter=critter_ok, xml_files=[xml_file])
+
+    xml = xml_file.read_text()
+    assert '<!DOCTYPE beast [<!ENTITY alignment SYSTEM "../alignment.xml">]>' in xml
+    assert '&alignment;' in xml
+    assert '<sequence ' not in xml
+
+    merge_xml(xml_file=xml_file, output=tmp_path / 'merged.xml')
+    merged = tmp_path / 'merged.xml'
+    assert merged.read_text() == inline_file.read_text()
+    assert len(ElementTree.parse(merged).getroot().findall('.//sequence')) == len(critter_ok.alignment.keys())
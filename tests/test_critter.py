@@ -1,12 +1,13 @@
 
 
+import time
 import jinja2
 
 from pathlib import Path
 
 from pandas import DataFrame
-from pytest import raises
-from critter.critter import Critter
+from pytest import raises, mark
+from critter.critter import Critter, get_template_environment
 from critter.errors import CritterError
 
 
@@ -110,4 +111,45 @@ def test_critter_base_load_template_success(
 
     assert isinstance(template, jinja2.Template)
 
+
+def test_critter_template_environment_shared_success():
+    """
+    GIVEN: Critter template environment (jinja2)
+    WHEN:  Templates are loaded multiple times
+    THEN:  Template environment and compiled templates are shared, with compiled templates cached on disk
+    """
+
+    environment = get_template_environment()
+
+    assert get_template_environment() is environment
+    assert isinstance(environment.bytecode_cache, jinja2.FileSystemBytecodeCache)
+    assert Critter.load_template(name='bdss.xml') is Critter.load_template(name='bdss.xml')
+
     
+
+
+@mark.benchmark
+def test_critter_xml_alignment_linear_scaling(tmp_path):
+    """
+    GIVEN: Critter instances with alignments of 1k, 10k and 100k sequences
+    WHEN:  Critter alignment block is built
+    THEN:  Critter alignment block build time per sequence stays constant (linear scaling)
+    """
+
+    def time_per_sequence(n: int) -> float:
+        alignment, dates = tmp_path / f'aln_{n}.fasta', tmp_path / f'dates_{n}.tsv'
+        with alignment.open('w') as aln, dates.open('w') as dts:
+            for i in range(n):
+                aln.write(f'>seq{i}\nACTGACTGACTGACTG\n')
+                dts.write(f'seq{i}\t2020.0\n')
+        crit = Critter(date_file=dates, alignment_file=alignment)
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            crit.xml_alignment
+            timings.append(time.perf_counter() - start)
+        return min(timings) / n
+
+    baseline = time_per_sequence(1000)
+    for n in (10000, 100000):
+        assert time_per_sequence(n) < 5 * baseline
@@ -0,0 +1,518 @@
+import numpy
+import pandas
+
+from pytest import raises
+from arviz.stats import hdi
+from critter.diagnostic import PosteriorDiagnostic, PosteriorMonitor, ValuesFormat, get_posterior_diagnostics, check_values_format, get_hpd_intervals, get_effective_sample_sizes
+from critter.errors import CritterError
+
+
+def test_posterior_diagnostic_parse_log_success(posterior_log_ok):
+    """
+    GIVEN: PosteriorDiagnostic instance with valid posterior log input
+    WHEN:  PosteriorDiagnostic instance is created
+    THEN:  PosteriorDiagnostic posterior log is parsed into float columns with burn-in removed
+    """
+
+    diagnostic = PosteriorDiagnostic(log_file=posterior_log_ok, burnin=0.1)
+
+    assert diagnostic.data['Sample'].tolist() == list(range(50000, 500001, 1000))
+    assert 'samplingProportion[1]' not in diagnostic.data.columns
+    assert all(
+        diagnostic.data[column].dtype == numpy.float64
+        for column in diagnostic.data.columns if column not in ('Sample', 'name')
+    )
+    assert diagnostic.data['TreeHeight'].values[-1] == 12.6623
+    assert diagnostic.data['clockRate'].values[-1] == 0.000573234
+
+
+def test_posterior_diagnostic_parse_log_fail(tmp_path):
+    """
+    GIVEN: PosteriorDiagnostic instance with invalid posterior log input (no header)
+    WHEN:  PosteriorDiagnostic instance is created
+    THEN:  PosteriorDiagnostic instance creation fails with CritterError
+    """
+
+    log = tmp_path / 'posterior.log'
+    log.write_text('# BEAST v2.6.3\n0\t1.0\t2.0\n')
+
+    with raises(CritterError):
+        PosteriorDiagnostic(log_file=log)
+
+
+def test_posterior_diagnostic_parse_log_burnin_success(posterior_log_ok):
+    """
+    GIVEN: PosteriorDiagnostic instances with valid posterior log input
+    WHEN:  PosteriorDiagnostic instances are created with different burn-in
+    THEN:  PosteriorDiagnostic posterior logs are parsed from the first sample after burn-in
+    """
+
+    for burnin, first in ((0, 0), (0.1, 50000), (0.2501, 126000), (0.5, 250000), (1.0, 500000)):
+        diagnostic = PosteriorDiagnostic(log_file=posterior_log_ok, burnin=burnin)
+        assert diagnostic.data['Sample'].values[0] == first
+        assert diagnostic.data['Sample'].values[-1] == 500000
+
+
+def test_posterior_diagnostic_parse_log_columns_success(posterior_log_ok):
+    """
+    GIVEN: PosteriorDiagnostic instances with valid posterior log input
+    WHEN:  PosteriorDiagnostic instances are created with requested columns or column prefixes
+    THEN:  PosteriorDiagnostic posterior logs are parsed with only the requested columns
+    """
+
+    diagnostic = PosteriorDiagnostic(log_file=posterior_log_ok, columns=['TreeHeight', 'origin'])
+    assert diagnostic.data.columns.tolist() == ['Sample', 'TreeHeight', 'origin', 'name']
+    assert diagnostic.summary['Parameter'].tolist() == ['TreeHeight', 'origin']
+
+    diagnostic = PosteriorDiagnostic(log_file=posterior_log_ok, prefixes=['reproductiveNumber'], columns=['TreeHeight'])
+    assert diagnostic.data.columns.tolist() == [
+        'Sample', 'TreeHeight', 'reproductiveNumber.1', 'reproductiveNumber.2', 'reproductiveNumber.3', 'name'
+    ]
+
+    with raises(CritterError):
+        PosteriorDiagnostic(log_file=posterior_log_ok, columns=['TreeHeight', 'treeHeight'])
+
+
+def test_posterior_diagnostic_summary_statistics_success(posterior_log_ok):
+    """
+    GIVEN: PosteriorDiagnostic instance with valid posterior log input
+    WHEN:  PosteriorDiagnostic summary statistics are computed for all parameters at once
+    THEN:  PosteriorDiagnostic summary statistics match column-wise pandas and arviz estimates
+    """
+
+    diagnostic = PosteriorDiagnostic(log_file=posterior_log_ok)
+    summary = diagnostic.summary.set_index('Parameter')
+
+    for column in diagnostic.data.columns:
+        if column in ('Sample', 'name'):
+            continue
+        posterior = diagnostic.data[column]
+        lower, upper = hdi(posterior.values, hdi_prob=0.95)
+        assert numpy.allclose(
+            summary.loc[column, ['Mean', 'Lower HPD', 'Upper HPD', 'Standard Deviation', 'Median', 'Minimum', 'Maximum']].values.astype(float),
+            [posterior.mean(), lower, upper, posterior.std(), posterior.median(), posterior.min(), posterior.max()]
+        )
+
+
+def test_get_hpd_intervals_success():
+    """
+    GIVEN: get_hpd_intervals function with valid samples of one or more parameters
+    WHEN:  get_hpd_intervals function is called
+    THEN:  get_hpd_intervals returns the narrowest intervals for each parameter
+    """
+
+    values = numpy.random.default_rng(1).gamma(2, size=(1000, 3))
+
+    lower, upper = get_hpd_intervals(values, alpha=0.95)
+    for i in range(3):
+        assert numpy.allclose([lower[i], upper[i]], hdi(values[:, i], hdi_prob=0.95))
+
+    lower, upper = get_hpd_intervals(values[:, 0], alpha=0.95)
+    assert numpy.allclose([lower, upper], hdi(values[:, 0], hdi_prob=0.95))
+
+    with raises(CritterError):
+        get_hpd_intervals(values[:10], alpha=1.0)
+
+
+def tracer_effective_sample_size(values: list, step: int, max_lag: int = 2000):
+    """ Line by line port of the ESS and autocorrelation time loop in Tracer (TraceCorrelation) """
+    samples = len(values)
+    max_lag = min(samples - 1, max_lag)
+    mean = sum(values) / samples
+    gamma_stat = [0.0] * max_lag
+    var_stat = 0.0
+    lag = 0
+    while lag < max_lag:
+        for j in range(samples - lag):
+            gamma_stat[lag] += (values[j] - mean) * (values[j + lag] - mean)
+        gamma_stat[lag] /= samples - lag
+        if lag == 0:
+            var_stat = gamma_stat[0]
+        elif lag % 2 == 0:
+            if gamma_stat[lag - 1] + gamma_stat[lag] > 0:
+                var_stat += 2.0 * (gamma_stat[lag - 1] + gamma_stat[lag])
+            else:
+                max_lag = lag
+        lag += 1
+    act = step * var_stat / gamma_stat[0]
+    return step * samples / act, act
+
+
+def test_posterior_diagnostic_effective_sample_sizes_success(posterior_log_ok):
+    """
+    GIVEN: PosteriorDiagnostic instance with valid posterior log input
+    WHEN:  PosteriorDiagnostic effective sample sizes are computed for all parameters at once
+    THEN:  PosteriorDiagnostic effective sample sizes match the Tracer estimator
+    """
+
+    diagnostic = PosteriorDiagnostic(log_file=posterior_log_ok)
+    summary = diagnostic.summary.set_index('Parameter')
+
+    for column in ('posterior', 'TreeHeight', 'becomeUninfectiousRate', 'reproductiveNumber.1', 'clockRate'):
+        ess, act = tracer_effective_sample_size(diagnostic.data[column].tolist(), step=1000)
+        assert numpy.isclose(summary.loc[column, 'ESS'], ess)
+        assert numpy.isclose(summary.loc[column, 'Autocorrelation Time'], act)
+
+    # Fixed parameters have no defined effective sample size
+    assert numpy.isnan(summary.loc['samplingProportion.1', 'ESS'])
+
+
+def test_get_effective_sample_sizes_success():
+    """
+    GIVEN: get_effective_sample_sizes function with valid samples of one or more parameters
+    WHEN:  get_effective_sample_sizes function is called
+    THEN:  get_effective_sample_sizes returns the Tracer estimates for each parameter
+    """
+
+    rng = numpy.random.default_rng(7)
+    values = numpy.empty((3000, 2))
+    values[0] = 0
+    for i in range(1, 3000):
+        values[i] = 0.9 * values[i - 1] + rng.normal(size=2)
+
+    ess, act = get_effective_sample_sizes(values, step=10)
+    for i in range(2):
+        assert numpy.allclose([ess[i], act[i]], tracer_effective_sample_size(values[:, i].tolist(), step=10))
+
+    # AR(1) with phi = 0.9 has integrated autocorrelation time (1 + phi) / (1 - phi) = 19
+    assert numpy.all((ess > 3000 / 30) & (ess < 3000 / 12))
+
+    ess, act = get_effective_sample_sizes(values[:1], step=10)
+    assert numpy.all(numpy.isnan(ess))
+
+
+def test_posterior_monitor_refresh_success(tmp_path, posterior_log_ok):
+    """
+    GIVEN: PosteriorMonitor instance following a posterior log that is being written
+    WHEN:  PosteriorMonitor is refreshed after rows (and incomplete rows) are appended
+    THEN:  PosteriorMonitor consumes only complete new rows and its summary matches a full parse
+    """
+
+    lines = posterior_log_ok.read_bytes().splitlines(keepends=True)
+    log = tmp_path / 'posterior.log'
+    log.write_bytes(b''.join(lines[:2]))
+
+    monitor = PosteriorMonitor(log_file=log, burnin=0.1, block_size=1, sketch_size=1000)
+    assert monitor.refresh() == 0
+
+    with log.open('ab') as log_out:
+        log_out.write(b''.join(lines[2:200]) + lines[200][:10])
+    assert monitor.refresh() == 197
+
+    with log.open('ab') as log_out:
+        log_out.write(lines[200][10:] + b''.join(lines[201:]))
+    assert monitor.refresh() == 304
+    assert monitor.refresh() == 0
+
+    expected = PosteriorDiagnostic(log_file=posterior_log_ok, burnin=0.1).summary
+    assert monitor.summary.columns.tolist() == expected.columns.tolist()
+    assert numpy.allclose(
+        monitor.summary.drop(columns=['Parameter', 'name']).values.astype(float),
+        expected.drop(columns=['Parameter', 'name']).values.astype(float),
+        equal_nan=True
+    )
+
+
+def test_posterior_monitor_burnin_block_success(tmp_path, posterior_log_ok):
+    """
+    GIVEN: PosteriorMonitor instance with default block size following a posterior log shorter than a block
+    WHEN:  PosteriorMonitor is refreshed as rows are appended and the burn-in cutoff moves
+    THEN:  PosteriorMonitor summary excludes burn-in rows and matches a full parse
+    """
+
+    lines = posterior_log_ok.read_bytes().splitlines(keepends=True)
+    log = tmp_path / 'posterior.log'
+    log.write_bytes(b''.join(lines[:300]))
+
+    monitor = PosteriorMonitor(log_file=log, burnin=0.5)
+    monitor.refresh()
+    with log.open('ab') as log_out:
+        log_out.write(b''.join(lines[300:]))
+    monitor.refresh()
+
+    expected = PosteriorDiagnostic(log_file=posterior_log_ok, burnin=0.5).summary
+    for statistic in ('Mean', 'Standard Deviation', 'Median', 'Minimum', 'Maximum'):
+        assert numpy.allclose(monitor.summary[statistic].values, expected[statistic].values)
+
+
+def test_posterior_monitor_sketch_bounded_success(posterior_log_ok):
+    """
+    GIVEN: PosteriorMonitor instance with a sketch smaller than the posterior log
+    WHEN:  PosteriorMonitor is refreshed
+    THEN:  PosteriorMonitor sketch is thinned to bounded size with exact running moments
+    """
+
+    monitor = PosteriorMonitor(log_file=posterior_log_ok, burnin=0, block_size=100, sketch_size=100)
+    assert monitor.refresh() == 501
+
+    assert monitor.thin == 8
+    assert len(monitor.data) == 63
+    assert monitor.data['Sample'].tolist() == list(range(0, 500001, 8000))
+
+    expected = PosteriorDiagnostic(log_file=posterior_log_ok, burnin=0).summary
+    for statistic in ('Mean', 'Standard Deviation', 'Minimum', 'Maximum'):
+        assert numpy.allclose(monitor.summary[statistic].values, expected[statistic].values)
+
+
+def test_get_posterior_diagnostics_workers_success(tmp_path, posterior_log_ok):
+    """
+    GIVEN: get_posterior_diagnostics function with multiple valid posterior logs
+    WHEN:  get_posterior_diagnostics function is called with multiple worker processes
+    THEN:  get_posterior_diagnostics yields a diagnostic for each log
+    """
+
+    logs = []
+    for i in range(4):
+        log = tmp_path / f'posterior_{i}.log'
+        log.write_bytes(posterior_log_ok.read_bytes())
+        logs.append(log)
+
+    expected = PosteriorDiagnostic(log_file=posterior_log_ok, prefixes=['TreeHeight']).summary
+    diagnostics = list(get_posterior_diagnostics(logs, workers=2, prefixes=['TreeHeight']))
+
+    assert all(logs[i] == d.log for i, d in diagnostics)
+    assert sorted(i for i, _ in diagnostics) == [0, 1, 2, 3]
+    diagnostics = [d for _, d in diagnostics]
+    for diagnostic in diagnostics:
+        assert diagnostic.summary.drop(columns='name').equals(expected.drop(columns='name'))
+
+
+def test_posterior_diagnostic_write_values_success(tmp_path, posterior_log_ok):
+    """
+    GIVEN: PosteriorDiagnostic instances with valid posterior log input
+    WHEN:  PosteriorDiagnostic posterior values are written and appended to a tab-delimited file
+    THEN:  PosteriorDiagnostic posterior values of all logs are written with a single header
+    """
+
+    values = tmp_path / 'posterior.tsv'
+    for i, diagnostic in get_posterior_diagnostics([posterior_log_ok, posterior_log_ok], prefixes=['TreeHeight']):
+        diagnostic.write_values(output=values, append=i > 0)
+
+    written = pandas.read_csv(values, sep='\t')
+    assert written.columns.tolist() == ['Sample', 'TreeHeight', 'name']
+    assert len(written) == 2 * 451
+
+    with raises(CritterError):
+        diagnostic.write_values(output=values, values_format='xlsx')
+
+
+def test_check_values_format_fail(monkeypatch):
+    """
+    GIVEN: check_values_format function with binary values formats
+    WHEN:  check_values_format function is called without the optional pyarrow dependency
+    THEN:  CritterError is raised for binary values formats only
+    """
+
+    monkeypatch.setattr('critter.diagnostic.find_spec', lambda name: None)
+
+    check_values_format(values_format=ValuesFormat.tsv)
+    for values_format in (ValuesFormat.parquet, ValuesFormat.feather):
+        with raises(CritterError):
+            check_values_format(values_format=values_format)
+
+
+def test_get_posterior_diagnostics_without_data_success(posterior_log_ok):
+    """
+    GIVEN: get_posterior_diagnostics function with a valid posterior log
+    WHEN:  get_posterior_diagnostics function is called without keeping posterior values
+    THEN:  get_posterior_diagnostics yields diagnostics with summary and empty posterior values
+    """
+
+    (_, diagnostic), = get_posterior_diagnostics([posterior_log_ok], keep_data=False)
+
+    assert diagnostic.data.empty
+    assert not diagnostic.summary.empty
+
+
+def test_posterior_diagnostic_cache_success(tmp_path, posterior_log_ok):
+    """
+    GIVEN: PosteriorDiagnostic instances with valid posterior log input and binary cache enabled
+    WHEN:  PosteriorDiagnostic instances are created before and after the cache is written or invalidated
+    THEN:  PosteriorDiagnostic posterior values are identical to parsing the log without cache
+    """
+
+    log = tmp_path / 'posterior.log'
+    log.write_bytes(posterior_log_ok.read_bytes())
+
+    expected = PosteriorDiagnostic(log_file=log, burnin=0.25, prefixes=['reproductiveNumber']).data
+
+    for _ in range(2):  # cache miss, cache hit
+        diagnostic = PosteriorDiagnostic(log_file=log, burnin=0.25, prefixes=['reproductiveNumber'], cache=True)
+        assert diagnostic.data.equals(expected)
+        assert len(list((tmp_path / '.critter-cache').glob('posterior.log.*.npy'))) == 1
+
+    # Changed log invalidates the cache
+    lines = log.read_bytes().splitlines(keepends=True)
+    log.write_bytes(b''.join(lines[:-100]))
+
+    expected = PosteriorDiagnostic(log_file=log, burnin=0.25).data
+    diagnostic = PosteriorDiagnostic(log_file=log, burnin=0.25, cache=True)
+
+    assert diagnostic.data.equals(expected)
+    assert len(list((tmp_path / '.critter-cache').glob('posterior.log.*.npy'))) == 1
+
+    # Caches of logs with names that extend the log name are kept
+    other = tmp_path / 'posterior.log.1'
+    other.write_bytes(posterior_log_ok.read_bytes())
+    PosteriorDiagnostic(log_file=other, cache=True)
+    log.write_bytes(posterior_log_ok.read_bytes())
+    PosteriorDiagnostic(log_file=log, cache=True)
+
+    cache_files = sorted(path.name for path in (tmp_path / '.critter-cache').iterdir())
+    assert len([name for name in cache_files if name.startswith('posterior.log.1.')]) == 2
+    assert len(cache_files) == 4
+
+
+def test_posterior_diagnostic_gridded_skyline_success(posterior_log_ok):
+    """
+    GIVEN: PosteriorDiagnostic instance with valid posterior log input with sliced parameters
+    WHEN:  PosteriorDiagnostic gridded skyline is computed
+    THEN:  PosteriorDiagnostic gridded skyline matches the per-sample `bdskytools` mapping
+    """
+
+    diagnostic = PosteriorDiagnostic(log_file=posterior_log_ok)
+    skyline = diagnostic._get_gridded_skyline(most_recent_sample_date=2020.5, grid_points=50)
+
+    assert skyline['Parameter'].unique().tolist() == ['reproductiveNumber', 'samplingProportion', 'becomeUninfectiousRate']
+
+    tree_height = diagnostic.data['TreeHeight'].values
+    grid = numpy.linspace(0, numpy.median(tree_height), 50)
+
+    # Per-sample mapping of equally sized intervals from the root, oldest first
+    columns = ['reproductiveNumber.1', 'reproductiveNumber.2', 'reproductiveNumber.3']
+    gridded = numpy.empty((len(tree_height), len(grid)))
+    for i, (height, values) in enumerate(zip(tree_height, diagnostic.data[columns].values)):
+        for j, time in enumerate(grid):
+            interval = int((height - time) / height * len(columns)) if time <= height else 0
+            gridded[i, j] = values[min(interval, len(columns) - 1)]
+
+    re_skyline = skyline[skyline['Parameter'] == 'reproductiveNumber']
+    lower, upper = get_hpd_intervals(gridded)
+
+    assert numpy.allclose(re_skyline['Time'].values, 2020.5 - grid)
+    assert numpy.allclose(re_skyline['Median'].values, numpy.median(gridded, axis=0))
+    assert numpy.allclose(re_skyline['Lower HPD'].values, lower)
+    assert numpy.allclose(re_skyline['Upper HPD'].values, upper)
+
+    # Not sliced parameter is constant over the grid
+    bu_skyline = skyline[skyline['Parameter'] == 'becomeUninfectiousRate']
+    assert numpy.allclose(bu_skyline['Median'].values, diagnostic.data['becomeUninfectiousRate'].median())
+
+
+def test_posterior_diagnostic_gridded_skyline_change_times_success(posterior_log_ok):
+    """
+    GIVEN: PosteriorDiagnostic instance with valid posterior log input with sliced parameters
+    WHEN:  PosteriorDiagnostic gridded skyline is computed with rate change times in reversed or forward time
+    THEN:  PosteriorDiagnostic gridded skyline maps intervals by change times as in BDSKY
+    """
+
+    diagnostic = PosteriorDiagnostic(log_file=posterior_log_ok)
+    tree_height = diagnostic.data['TreeHeight'].values
+    origin = diagnostic.data['origin'].values
+    grid = numpy.linspace(0, numpy.median(tree_height), 50)
+    values = diagnostic.data[['reproductiveNumber.1', 'reproductiveNumber.2', 'reproductiveNumber.3']].values
+
+    # Reversed time arrays: ages before the most recent sample, most recent interval first
+    skyline = diagnostic._get_gridded_skyline(
+        most_recent_sample_date=2020.5, grid_points=50, change_times={'reproductiveNumber': [10, 0, 5]}
+    )
+    gridded = values[:, numpy.where(grid < 5, 0, numpy.where(grid < 10, 1, 2))]
+    re_skyline = skyline[skyline['Parameter'] == 'reproductiveNumber']
+    assert numpy.allclose(re_skyline['Median'].values, numpy.median(gridded, axis=0))
+
+    # Forward time arrays: times from the origin of each sample, oldest interval first
+    skyline = diagnostic._get_gridded_skyline(
+        most_recent_sample_date=2020.5, grid_points=50,
+        change_times={'reproductiveNumber': [0, 5, 10]}, reverse_time_arrays=False
+    )
+    forward = origin[:, None] - grid[None, :]
+    intervals = numpy.where(forward < 5, 0, numpy.where(forward < 10, 1, 2))
+    gridded = numpy.take_along_axis(values, intervals, axis=1)
+    re_skyline = skyline[skyline['Parameter'] == 'reproductiveNumber']
+    assert numpy.allclose(re_skyline['Median'].values, numpy.median(gridded, axis=0))
+
+    with raises(CritterError):
+        diagnostic._get_gridded_skyline(most_recent_sample_date=2020.5, change_times={'reproductiveNumber': [0, 5]})
+
+
+def test_posterior_diagnostic_compact_success(tmp_path, posterior_log_ok):
+    """
+    GIVEN: PosteriorDiagnostic instances with valid posterior log input in compact storage mode
+    WHEN:  PosteriorDiagnostic instances are created with and without binary cache
+    THEN:  PosteriorDiagnostic posterior values are stored as float32 with a categorical name column
+    """
+
+    log = tmp_path / 'posterior.log'
+    log.write_bytes(posterior_log_ok.read_bytes())
+
+    expected = PosteriorDiagnostic(log_file=log)
+    for cache in (False, True, True):
+        diagnostic = PosteriorDiagnostic(log_file=log, compact=True, cache=cache)
+
+        assert diagnostic.data['Sample'].tolist() == expected.data['Sample'].tolist()
+        assert diagnostic.data['name'].dtype == 'category'
+        assert diagnostic.data['name'].cat.categories.tolist() == ['posterior.log']
+        assert all(
+            diagnostic.data[column].dtype == numpy.float32
+            for column in diagnostic.data.columns if column not in ('Sample', 'name')
+        )
+        assert numpy.allclose(
+            diagnostic.summary['Mean'].values, expected.summary['Mean'].values, rtol=1e-6
+        )
+
+
+def test_posterior_diagnostic_thinning_success(tmp_path, posterior_log_ok):
+    """
+    GIVEN: PosteriorDiagnostic instances with valid posterior log input and thinning options
+    WHEN:  PosteriorDiagnostic instances are created with thinning factor, target samples and target ESS
+    THEN:  PosteriorDiagnostic posterior values are every n-th row after burn-in, with and without binary cache
+    """
+
+    log = tmp_path / 'posterior.log'
+    log.write_bytes(posterior_log_ok.read_bytes())
+
+    expected = PosteriorDiagnostic(log_file=log)
+    assert expected.thin == 1
+
+    for cache in (False, True):
+        diagnostic = PosteriorDiagnostic(log_file=log, thin=10, cache=cache)
+        assert diagnostic.thin == 10
+        assert diagnostic.data['Sample'].tolist() == expected.data['Sample'].tolist()[::10]
+
+        diagnostic = PosteriorDiagnostic(log_file=log, samples=100, cache=cache)
+        assert diagnostic.thin == 5
+        assert len(diagnostic.data) <= 100
+        assert diagnostic.data['Sample'].tolist() == expected.data['Sample'].tolist()[::5]
+
+        diagnostic = PosteriorDiagnostic(log_file=log, samples=1000, cache=cache)
+        assert diagnostic.thin == 1
+
+        for ess in (20, 100, 200):
+            diagnostic = PosteriorDiagnostic(log_file=log, ess=ess, cache=cache)
+            assert diagnostic.thin == len(expected.data) // ess
+            assert ess <= len(diagnostic.data) < 2 * ess
+            assert diagnostic.data['Sample'].tolist() == expected.data['Sample'].tolist()[::diagnostic.thin]
+
+        diagnostic = PosteriorDiagnostic(log_file=log, ess=1000, cache=cache)
+        assert diagnostic.thin == 1
+
+    # Thinning across chunk boundaries
+    header, data_start = diagnostic._read_header()
+    diagnostic.thin, diagnostic.samples = 3, None
+    df = diagnostic._read_rows(
+        header=header, columns=['Sample', 'posterior'], start=data_start, sample=50000, last_sample=500000, chunk_size=7
+    )
+    assert df['Sample'].tolist() == expected.data['Sample'].tolist()[::3]
+    assert df['posterior'].tolist() == expected.data['posterior'].tolist()[::3]
+
+
+def test_posterior_diagnostic_thinning_fail(posterior_log_ok):
+    """
+    GIVEN: PosteriorDiagnostic instance with valid posterior log input
+    WHEN:  PosteriorDiagnostic instance is created with a thinning factor, target samples or target ESS that is not positive
+    THEN:  CritterError is raised
+    """
+
+    for options in ({'thin': 0}, {'samples': 0}, {'samples': -1}, {'ess': 0}, {'ess': -10}):
+        with raises(CritterError):
+            PosteriorDiagnostic(log_file=posterior_log_ok, **options)
@@ -1,5 +1,6 @@
 from critter.models import BirthDeathSkylineSerial
 from critter.critter import Critter
+from critter.blocks.substitutions import HKY
 from pathlib import Path
 
 def test_model_bdss_success(
@@ -103,4 +104,38 @@ def test_model_bdss_slice_xml_function_success(
     )
     assert xml_slice_functions == bdss_sampling_proportion_slice_function_xml
     assert xml_slice_loggers == bdss_sampling_proportion_slice_logger_xml
-    assert xml_slice_rate_change_times == bdss_sampling_proportion_slice_rate_change_times_xml
\ No newline at end of file
+    assert xml_slice_rate_change_times == bdss_sampling_proportion_slice_rate_change_times_xml
+
+def test_model_bdss_render_stream_success(
+    tmpdir,
+    critter_ok,
+    bdss_strict_clock_model,
+    bdss_origin_prior,
+    bdss_sampling_proportion_prior_sliced,
+    bdss_reproductive_number_prior,
+    bdss_become_uninfectious_rate_prior
+):
+    """
+    GIVEN: BirthDeathSkylineSerial instance with valid input data
+    WHEN:  BirthDeathSkylineSerial is rendered in streaming and non-streaming mode
+    THEN:  BirthDeathSkylineSerial renders identical model XML in both modes
+    """
+
+    bdss = BirthDeathSkylineSerial(
+        critter=critter_ok,
+        substitution=HKY(),
+        clock=bdss_strict_clock_model,
+        origin=bdss_origin_prior,
+        sampling_proportion=bdss_sampling_proportion_prior_sliced,
+        reproductive_number=bdss_reproductive_number_prior,
+        become_uninfectious_rate=bdss_become_uninfectious_rate_prior
+    )
+
+    streamed = Path(tmpdir.join('bdss_stream.xml'))
+    rendered = Path(tmpdir.join('bdss_render.xml'))
+
+    bdss.render(xml_file=streamed, stream=True)
+    bdss.render(xml_file=rendered, stream=False)
+
+    assert streamed.read_text() == rendered.read_text()
+    assert critter_ok.xml_alignment in streamed.read_text()
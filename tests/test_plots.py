@@ -0,0 +1,36 @@
+import numpy
+import matplotlib
+
+from pytest import raises
+from critter.plots import TreeView
+from critter.errors import CritterError
+
+matplotlib.use('Agg')
+
+
+def test_tree_view_draw_success(tmp_path, tree_log_ok):
+    """
+    GIVEN: TreeView instance with valid NEXUS tree log and cluster data input
+    WHEN:  TreeView is drawn with cluster coloring
+    THEN:  TreeView layout places tips evenly and internal nodes at the mean of their children
+    """
+
+    data_file = tmp_path / 'clusters.tsv'
+    data_file.write_text('name\tcluster\nA_2020.1\tx\nB_2020.3\tx\nC_2020.5\ty\nD_2020.9\tz\n')
+
+    tree_view = TreeView(tree_file=tree_log_ok, data_file=data_file)
+    tree_view.draw(clusters='cluster', output=tmp_path / 'tree.png')
+
+    assert (tmp_path / 'tree.png').exists()
+    assert tree_view.tree.state == 0
+
+    x, y = tree_view._get_layout()
+    assert y.tolist() == [1.5, 0.5, 0., 1., 2.5, 2., 3.]
+    assert numpy.allclose(x, [0., 0.433, 0.747, 1.023, 0.159, 0.803, 0.822])
+
+    node_clusters, categories = tree_view._get_clusters(clusters='cluster')
+    assert categories == ['x', 'y', 'z']
+    assert node_clusters.tolist() == [-1, 0, 0, 0, -1, 1, 2]
+
+    with raises(CritterError):
+        tree_view._get_clusters(clusters='lineage')
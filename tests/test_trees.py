@@ -0,0 +1,120 @@
+import numpy
+
+from pytest import raises
+from critter.trees import TreeLog, MaximumCladeCredibility, parse_newick
+from critter.errors import CritterError
+
+
+def test_tree_log_nexus_burnin_thin_success(tree_log_ok):
+    """
+    GIVEN: TreeLog instance with valid NEXUS tree log input
+    WHEN:  TreeLog instance is created with burn-in and thinning
+    THEN:  TreeLog translate block is read and trees after burn-in are thinned by state
+    """
+
+    tree_log = TreeLog(tree_file=tree_log_ok, burnin=0.1)
+
+    assert tree_log.nexus
+    assert tree_log.taxa == ['A_2020.1', 'B_2020.3', 'C_2020.5', 'D_2020.9']
+    assert tree_log.translate['3'] == 'C_2020.5'
+    assert [state for state, _ in tree_log.read_trees()] == list(range(1000, 11000, 1000))
+
+    tree_log = TreeLog(tree_file=tree_log_ok, burnin=0.1, thin=3)
+    assert [tree.state for tree in tree_log] == [1000, 4000, 7000, 10000]
+
+    with raises(CritterError):
+        TreeLog(tree_file=tree_log_ok, thin=0)
+
+
+def test_tree_log_array_tree_success(tree_log_ok):
+    """
+    GIVEN: TreeLog instance with valid NEXUS tree log input
+    WHEN:  Last tree is parsed into an array tree
+    THEN:  ArrayTree has preorder parent indices, branch lengths and heights without metadata comments
+    """
+
+    tree = list(TreeLog(tree_file=tree_log_ok, burnin=0.9))[-1]
+
+    assert tree.state == 10000
+    assert tree.parent.tolist() == [-1, 0, 1, 1, 0, 4, 4]
+    assert tree.names == [None, None, 'A_2020.1', 'B_2020.3', None, 'C_2020.5', 'D_2020.9']
+    assert tree.tips.tolist() == [2, 3, 5, 6]
+    assert numpy.allclose(tree.branch_length, [0., 0.365, 0.469, 0.236, 0.14, 0.792, 0.885])
+
+    depth = numpy.array([0., 0.365, 0.834, 0.601, 0.14, 0.932, 1.025])
+    assert numpy.allclose(tree.height, depth.max() - depth)
+    assert numpy.isclose(tree.root_height, 1.025)
+
+    assert tree.to_newick() == '((A_2020.1:0.469,B_2020.3:0.236):0.365,(C_2020.5:0.792,D_2020.9:0.885):0.14);'
+
+
+def test_tree_log_newick_success(tmp_path):
+    """
+    GIVEN: TreeLog instance with valid Newick file input (one tree per line)
+    WHEN:  TreeLog instance is created with burn-in
+    THEN:  TreeLog taxa are read from the first tree and burn-in is applied to the number of trees
+    """
+
+    tree_file = tmp_path / 'trees.nwk'
+    tree_file.write_text(
+        '\n'.join(['((a:1,b:1):1,c:2);', '((a:1,c:1):1,b:2);', "(('b':1,a:1):1,c:2);", '((a:1,b:1):2,c:3);'])
+    )
+
+    tree_log = TreeLog(tree_file=tree_file, burnin=0.5)
+
+    assert not tree_log.nexus
+    assert tree_log.taxa == ['a', 'b', 'c']
+    trees = list(tree_log)
+    assert [tree.state for tree in trees] == [None, None]
+    assert trees[0].names == [None, None, 'b', 'a', 'c']
+    assert trees[1].root_height == 3.
+
+
+def test_parse_newick_fail():
+    """
+    GIVEN: Newick strings with unknown tip labels or unbalanced parentheses
+    WHEN:  Newick strings are parsed
+    THEN:  CritterError is raised
+    """
+
+    with raises(CritterError):
+        parse_newick('((a:1,d:1):1,c:2);', labels={'a': 0, 'b': 1, 'c': 2}, taxa=['a', 'b', 'c'])
+
+    with raises(CritterError):
+        parse_newick('((a:1,b:1):1,c:2;', labels={'a': 0, 'b': 1, 'c': 2}, taxa=['a', 'b', 'c'])
+
+
+def test_maximum_clade_credibility_success(tmp_path, tree_log_ok):
+    """
+    GIVEN: MaximumCladeCredibility instance with valid NEXUS tree log input
+    WHEN:  MaximumCladeCredibility instances are created with one and multiple workers
+    THEN:  MaximumCladeCredibility tree has the highest clade credibility with median node heights
+    """
+
+    trees = list(TreeLog(tree_file=tree_log_ok))
+    mcc = MaximumCladeCredibility(tree_log=TreeLog(tree_file=tree_log_ok))
+
+    assert mcc.trees == 10
+    assert mcc.clades == {0b0011: 10, 0b1100: 5, 0b0111: 3, 0b1011: 2, 0b1111: 10}
+    assert numpy.isclose(mcc.score, numpy.log(0.5))
+
+    assert mcc.tree.state == 2000
+    assert mcc.tree.parent.tolist() == [-1, 0, 1, 1, 0, 4, 4]
+    assert mcc.tree.get_clades() == [0b1111, 0b0011, 0b0001, 0b0010, 0b1100, 0b0100, 0b1000]
+    assert numpy.isclose(mcc.tree.root_height, numpy.median([tree.root_height for tree in trees]))
+    assert numpy.allclose(mcc.tree.height[mcc.tree.parent[1:]] - mcc.tree.height[1:], mcc.tree.branch_length[1:])
+    assert mcc.annotations[4].startswith('[&posterior=0.5,')
+    assert 'height_95%_HPD=' in mcc.annotations[0]
+
+    parallel = MaximumCladeCredibility(tree_log=TreeLog(tree_file=tree_log_ok), workers=2, batch_size=3)
+    assert parallel.tree.to_newick(parallel.annotations) == mcc.tree.to_newick(mcc.annotations)
+
+    # Node heights exceeding the memory limit are collected in multiple passes
+    chunked = MaximumCladeCredibility(tree_log=TreeLog(tree_file=tree_log_ok), max_memory=3*10*8)
+    assert chunked.tree.to_newick(chunked.annotations) == mcc.tree.to_newick(mcc.annotations)
+
+    output = tmp_path / 'mcc.tree'
+    mcc.write(output=output)
+    mcc_log = TreeLog(tree_file=output, burnin=0.)
+    assert mcc_log.taxa == trees[0].taxa
+    assert numpy.allclose(list(mcc_log)[0].branch_length, mcc.tree.branch_length)
@@ -1,4 +1,6 @@
-from critter.utils import get_uuid
+from pytest import raises
+from critter.utils import get_uuid, get_id, id_scope, merge_xml
+from critter.errors import CritterError
 
 
 def test_utils_get_uuid():
@@ -23,3 +25,39 @@ def test_version_var():
     """
     from critter.version import __version__
     assert type(__version__) == str
+
+
+def test_utils_get_id_scope():
+    """
+    GIVEN:  utility functions get_id() and id_scope() with valid params
+    WHEN:   identifiers are allocated in and out of identifier scopes
+    THEN:   sequential identifiers per namespace are returned and restored on scope exit
+    """
+    first = get_id('Test')
+    assert first.startswith('Test.')
+    number = int(first.split('.')[1])
+    assert get_id('Other') != get_id('Other')
+
+    with id_scope():
+        assert get_id('Test') == f'Test.{number + 1}'
+        assert get_id('Test') == f'Test.{number + 2}'
+    with id_scope():
+        assert get_id('Test') == f'Test.{number + 1}'
+
+    assert get_id('Test') == f'Test.{number + 1}'
+
+
+def test_utils_merge_xml_fail(tmp_path):
+    """
+    GIVEN:  utility function merge_xml() with a model XML referencing a missing entity file
+    WHEN:   utility function merge_xml() is called
+    THEN:   CritterError is raised
+    """
+    xml_file = tmp_path / 'model.xml'
+    xml_file.write_text(
+        '<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n'
+        '<!DOCTYPE beast [<!ENTITY alignment SYSTEM "missing.xml">]>\n'
+        '<beast><data>&alignment;</data></beast>\n'
+    )
+    with raises(CritterError):
+        merge_xml(xml_file=xml_file, output=tmp_path / 'merged.xml')